@@ -0,0 +1,261 @@
+# bench_library.py
+"""Benchmarks for Library operations on synthetic catalogues.
+
+For each catalogue size a fresh temp database is filled with generated books
+(about two copies per title) and members, then:
+
+- Library (library_core_oops) is timed on add_book, borrow_book, return_book,
+  view_books, view_reports, search_books and delete_book against real SQLite;
+- the Flask endpoints are timed through the Flask test client;
+- the in-memory library_core module is timed on the same operations.
+
+Library's read cache is invalidated (untimed) before every timed read, so
+read timings measure the queries. The same reads on a warm cache are
+reported separately as <operation>_cached (or "<route> (cached)").
+
+Results are written as JSON (one entry per engine / operation / size, with
+mean and percentile latencies) so runs can be compared across versions:
+
+    python bench_library.py --sizes 10000 100000 --output bench.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import library_db
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+DEFAULT_REPEAT = 200
+FULL_SCAN_REPEAT = 3  # whole-table reads (view_books with no limit) are slow at 1M rows
+LOAD_BATCH_SIZE = 10_000
+
+GENRES = ("Fiction", "Classic", "Self-Help", "Science", "History", "Fantasy", "Poetry", "Biography")
+WORDS = ("river", "shadow", "garden", "winter", "empire", "silent", "golden", "atlas", "harbor", "forest",
+         "letter", "ember", "voyage", "mirror", "orchard", "signal", "paper", "summit", "lantern", "echo")
+
+
+def _title(k):
+    return f"{WORDS[k % len(WORDS)].title()} {WORDS[k // len(WORDS) % len(WORDS)]} {k}"
+
+
+def generate_catalogue(size, rng):
+    """Yield (title, author, genre) for `size` books, about two copies per title."""
+    titles = max(1, size // 2)
+    for _ in range(size):
+        k = rng.randrange(titles)
+        yield _title(k), f"Author {k % 5000}", GENRES[k % len(GENRES)]
+
+
+def generate_members(count):
+    """Yield (name, age, contact_info) for `count` members; contact_info is numeric for library_core."""
+    for i in range(count):
+        yield f"Member {i}", 18 + i % 60, str(5550000 + i)
+
+
+def _summary(samples):
+    ms = sorted(s * 1000 for s in samples)
+    return {
+        "count": len(ms),
+        "mean_ms": round(statistics.fmean(ms), 4),
+        "p50_ms": round(ms[len(ms) // 2], 4),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4),
+        "max_ms": round(ms[-1], 4),
+        "ops_per_sec": round(len(ms) / (sum(ms) / 1000), 1) if sum(ms) else None,
+    }
+
+
+def _timeit(fn, calls, setup=None):
+    """Call fn(*args) for each args tuple in calls and summarise the latencies.
+
+    setup, if given, is called before each call and is not timed.
+    """
+    samples = []
+    for args in calls:
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn(*args)
+        samples.append(time.perf_counter() - start)
+    return _summary(samples)
+
+
+def _timeit_cached(fn, calls):
+    """Like _timeit, but every call is made once untimed first, so the timed calls hit a warm cache."""
+    for args in calls:
+        fn(*args)
+    return _timeit(fn, calls)
+
+
+def _workload(size, repeat, rng):
+    """Titles, members and ids the benchmarks pick from, the same for every engine."""
+    titles = max(1, size // 2)
+    members = max(1, size // 10)
+    return {
+        "borrows": [(_title(rng.randrange(titles)), f"Member {rng.randrange(members)}") for _ in range(repeat)],
+        "pages": [(rng.randrange(size),) for _ in range(repeat)],
+        "searches": [(f"{rng.choice(WORDS)[:4]}",) for _ in range(repeat)],
+        "new_books": [(f"New title {i}", "Bench Author", rng.choice(GENRES)) for i in range(repeat)],
+        "deletes": rng.sample(range(1, size + 1), min(repeat, size)),
+    }
+
+
+def load_database(size, rng):
+    """Fill the current library_db database with size books and size // 10 members."""
+    start = time.perf_counter()
+    library_db.init_db()
+    books = generate_catalogue(size, rng)
+    with library_db.transaction() as conn:
+        while batch := list(itertools.islice(books, LOAD_BATCH_SIZE)):
+            conn.executemany("INSERT INTO books (title, author, genre, available) VALUES (?, ?, ?, 1)", batch)
+        conn.executemany("INSERT INTO members (name, age, contact_info) VALUES (?, ?, ?)",
+                         generate_members(max(1, size // 10)))
+    library_db.execute_query("ANALYZE")
+    return time.perf_counter() - start
+
+
+def bench_library(library, work):
+    """Time the SQLite-backed Library (library_core_oops)."""
+    results = {}
+    results["add_book"] = _timeit(library.add_book, work["new_books"])
+    results["borrow_book"] = _timeit(library.borrow_book, work["borrows"])
+    results["return_book"] = _timeit(library.return_book, work["borrows"])
+    cold = library._invalidate
+
+    def page(after_id):
+        return library.view_books(after_id, 100)
+
+    def report():
+        return library.view_reports(extended=True)
+    reports = [()] * len(work["pages"])
+
+    results["view_books_page"] = _timeit(page, work["pages"], setup=cold)
+    results["view_books_page_cached"] = _timeit_cached(page, work["pages"])
+    results["view_books_all"] = _timeit(library.view_books, [()] * FULL_SCAN_REPEAT, setup=cold)
+    results["view_reports_cold"] = _timeit(report, reports, setup=cold)
+    results["view_reports_cached"] = _timeit_cached(report, reports)
+    results["search_books"] = _timeit(library.search_books, work["searches"], setup=cold)
+    results["search_books_cached"] = _timeit_cached(library.search_books, work["searches"])
+    results["delete_book"] = _timeit(library.delete_book, [(book_id,) for book_id in work["deletes"]])
+    return results
+
+
+def bench_api(library, work):
+    """Time the Flask endpoints through the test client (no network, full request handling)."""
+    import library_api  # imported here so its module-level Library() opens the benchmark database
+    library_api.library = library
+    client = library_api.app.test_client()
+    cold = library._invalidate
+    reads = {
+        "GET /books": (lambda after_id: client.get(f"/books?after_id={after_id}&limit=100"), work["pages"]),
+        "GET /reports": (lambda: client.get("/reports?extended=true"), [()] * len(work["pages"])),
+        "GET /books/search": (lambda q: client.get("/books/search", query_string={"q": q}), work["searches"]),
+    }
+    results = {}
+    for route, (fn, calls) in reads.items():
+        results[route] = _timeit(fn, calls, setup=cold)
+        results[f"{route} (cached)"] = _timeit_cached(fn, calls)
+    results["POST /borrow"] = _timeit(lambda title, member: client.post(
+        "/borrow", data={"title": title, "member": member}), work["borrows"])
+    results["POST /return"] = _timeit(lambda title, member: client.post(
+        "/return", data={"title": title, "member": member}), work["borrows"])
+    return results
+
+
+def bench_core(size, work, rng):
+    """Time the in-memory library_core module on the same workload."""
+    import library_core
+    library_core.reset()
+    start = time.perf_counter()
+    for book in generate_catalogue(size, rng):
+        library_core.add_book(*book)
+    for member in generate_members(max(1, size // 10)):
+        library_core.register_member(*member)
+    results = {"load": {"seconds": round(time.perf_counter() - start, 3)}}
+    results["add_book"] = _timeit(library_core.add_book, work["new_books"])
+    results["borrow_book"] = _timeit(library_core.borrow_book, work["borrows"])
+    results["return_book"] = _timeit(library_core.return_book, work["borrows"])
+    results["view_books_all"] = _timeit(library_core.view_books, [()] * FULL_SCAN_REPEAT)
+    results["view_reports"] = _timeit(lambda: library_core.view_reports(extended=True), [()] * len(work["pages"]))
+    results["search_books"] = _timeit(library_core.search_books, work["searches"])
+    library_core.reset()
+    return results
+
+
+def run(sizes, repeat, engines, seed=0):
+    """Run the selected engines (oops, api, core) for each size; return the JSON-ready report."""
+    from library_core_oops import Library
+
+    report = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "storage": library_db.storage_settings(),
+        "repeat": repeat,
+        "results": [],
+    }
+    original_db = library_db.DB_NAME
+    for size in sizes:
+        work = _workload(size, repeat, random.Random(seed))
+        with tempfile.TemporaryDirectory(prefix="library-bench-") as tmp:
+            library_db.configure(db_path=os.path.join(tmp, "library.db"))
+            try:
+                if "oops" in engines or "api" in engines:
+                    load_seconds = load_database(size, random.Random(seed))
+                    report["results"].append({"engine": "sqlite", "size": size, "operation": "load",
+                                              "seconds": round(load_seconds, 3)})
+                    library = Library()
+                    if "oops" in engines:
+                        for op, stats in bench_library(library, work).items():
+                            report["results"].append({"engine": "oops", "size": size, "operation": op, **stats})
+                    if "api" in engines:
+                        for op, stats in bench_api(library, work).items():
+                            report["results"].append({"engine": "api", "size": size, "operation": op, **stats})
+            finally:
+                library_db.configure(db_path=original_db)
+        if "core" in engines:
+            for op, stats in bench_core(size, work, random.Random(seed)).items():
+                report["results"].append({"engine": "core", "size": size, "operation": op, **stats})
+    return report
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Library operations on synthetic catalogues.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="catalogue sizes (books)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="timed calls per operation")
+    parser.add_argument("--engines", nargs="+", choices=("oops", "api", "core"), default=("oops", "api", "core"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="JSON output file, or '-' for stdout")
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.repeat, set(args.engines), args.seed)
+    if args.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Wrote {len(report['results'])} results to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,186 @@
 # library_api.py
-from flask import Flask, jsonify, request
+import io
+import json
+import os
+from collections.abc import Mapping
+from datetime import datetime
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flasgger import Swagger
-from library_core_oops import Library
+from library_core_oops import Library, IMPORT_FORMATS, DEFAULT_IMPORT_BATCH_SIZE
+from library_metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from library_tracing import RequestTracer, TracedLibrary
+
+
+def _json_default(o):
+    """Serialise Library records (dict-like, slots-backed) as plain JSON objects."""
+    if isinstance(o, Mapping):
+        return dict(o)
+    return DefaultJSONProvider.default(o)
+
+
+class LibraryJSONProvider(DefaultJSONProvider):
+    default = staticmethod(_json_default)
+
 
 app = Flask(__name__)
+app.json = LibraryJSONProvider(app)
 swagger = Swagger(app)
-library = Library()
+# Request ids, per-route latency and the flask / library / sqlite split (see library_tracing)
+tracer = RequestTracer(app)
+# LIBRARY_WRITE_BEHIND=1 batches /borrow and /return writes through one writer thread
+library = TracedLibrary(Library(write_behind=os.environ.get("LIBRARY_WRITE_BEHIND") == "1"))
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def _page_args():
+    """Read the after_id/limit keyset pagination query parameters."""
+    after_id = request.args.get("after_id", type=int)
+    limit = request.args.get("limit", DEFAULT_PAGE_SIZE, type=int)
+    return after_id, max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def _import_source():
+    """Return (text stream, format) for a bulk upload.
+
+    Accepts a multipart `file` field or the raw request body. The format comes
+    from the `format` query parameter, else the file extension / content type.
+    """
+    upload = request.files.get("file")
+    raw = upload.stream if upload else request.stream
+    name = (upload.filename if upload else "") or ""
+    content_type = (upload.mimetype if upload else request.mimetype) or ""
+    fmt = request.args.get("format")
+    if not fmt:
+        is_jsonl = name.endswith((".jsonl", ".ndjson")) or content_type in ("application/x-ndjson", "application/jsonl")
+        fmt = "jsonl" if is_jsonl else "csv"
+    return io.TextIOWrapper(raw, encoding="utf-8-sig", newline=""), fmt
+
+
+def _bulk_import(importer):
+    stream, fmt = _import_source()
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"message": f"❌ Unsupported format '{fmt}'."}), 400
+    batch_size = max(1, request.args.get("batch_size", DEFAULT_IMPORT_BATCH_SIZE, type=int))
+    try:
+        report = importer(stream, fmt, batch_size)
+    except ValueError as e:
+        return jsonify({"message": f"❌ {e}."}), 400
+    return jsonify(report), 200
+
+
+def _page(rows, limit):
+    """Drop the look-ahead row (fetched as limit + 1) and derive the next cursor."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, rows[-1]["id"]
+    return rows, None
 
 @app.route('/books', methods=['GET'])
 def get_books():
     """
-    Get All Books
+    Get Books (paginated)
     ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Return books with an id greater than this (the previous page's next_cursor)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (default 100, max 1000)
     responses:
       200:
-        description: Returns all books in the library
+        description: Returns one page of books and the cursor for the next page
     """
-    books = library.view_books()
-    return jsonify(books), 200
+    after_id, limit = _page_args()
+    books, next_cursor = _page(library.view_books(after_id, limit + 1), limit)
+    return jsonify({"books": books, "next_cursor": next_cursor}), 200
 
 
 @app.route('/members', methods=['GET'])
 def get_members():
     """
-    Get All Members
+    Get Members (paginated)
     ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+        description: Return members with an id greater than this (the previous page's next_cursor)
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (default 100, max 1000)
+    responses:
+      200:
+        description: Returns one page of members and the cursor for the next page
+    """
+    after_id, limit = _page_args()
+    members, next_cursor = _page(library.view_members(after_id, limit + 1), limit)
+    return jsonify({"members": members, "next_cursor": next_cursor}), 200
+
+
+@app.route('/titles', methods=['GET'])
+def get_titles():
+    """
+    Get Titles with Copy Counts (paginated)
+    ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (default 100, max 1000)
+    responses:
+      200:
+        description: One page of titles with total_copies / available_copies and the next cursor
+    """
+    after_id, limit = _page_args()
+    titles, next_cursor = _page(library.view_titles(after_id, limit + 1), limit)
+    return jsonify({"titles": titles, "next_cursor": next_cursor}), 200
+
+
+@app.route('/books/search', methods=['GET'])
+def search_books():
+    """
+    Search Books
+    ---
+    parameters:
+      - name: q
+        in: query
+        type: string
+        required: true
+        description: Words to match (prefix match) against title, author and genre
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (default 100, max 1000)
+      - name: offset
+        in: query
+        type: integer
+        required: false
     responses:
       200:
-        description: Returns all registered members
+        description: Matching books, best matches first
     """
-    members = library.view_members()
-    return jsonify(members), 200
+    query = request.args.get("q", "")
+    _, limit = _page_args()
+    offset = max(0, request.args.get("offset", 0, type=int))
+    books = library.search_books(query, limit, offset)
+    return jsonify({"query": query, "books": books}), 200
 
 
 @app.route('/book', methods=['POST'])
@@ -139,5 +289,355 @@ def return_book():
     return jsonify({"message": msg}), 200
 
 
+@app.route('/books/<int:book_id>/borrow', methods=['POST'])
+def borrow_book_by_id(book_id):
+    """
+    Borrow a Specific Copy by Id
+    ---
+    parameters:
+      - name: book_id
+        in: path
+        type: integer
+        required: true
+      - name: member_id
+        in: formData
+        type: integer
+        required: true
+    responses:
+      200:
+        description: Borrow a copy by primary key, with no title or name matching
+      400:
+        description: Missing or non-integer member_id
+    """
+    member_id = request.form.get("member_id", type=int)
+    if member_id is None:
+        return jsonify({"message": "❌ member_id must be an integer."}), 400
+    return jsonify({"message": library.borrow_by_id(book_id, member_id)}), 200
+
+
+@app.route('/books/<int:book_id>/return', methods=['POST'])
+def return_book_by_id(book_id):
+    """
+    Return a Specific Copy by Id
+    ---
+    parameters:
+      - name: book_id
+        in: path
+        type: integer
+        required: true
+      - name: member_id
+        in: formData
+        type: integer
+        required: true
+    responses:
+      200:
+        description: Close the member's open loan of this copy
+      400:
+        description: Missing or non-integer member_id
+    """
+    member_id = request.form.get("member_id", type=int)
+    if member_id is None:
+        return jsonify({"message": "❌ member_id must be an integer."}), 400
+    return jsonify({"message": library.return_by_id(book_id, member_id)}), 200
+
+
+@app.route('/resolve', methods=['POST'])
+def resolve():
+    """
+    Resolve Titles and Member Names to Ids
+    ---
+    consumes:
+      - application/json
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            titles:
+              type: array
+              items:
+                type: string
+            members:
+              type: array
+              items:
+                type: string
+    responses:
+      200:
+        description: Every matching copy id per title (free copies first) and member id per name
+      400:
+        description: Malformed body or more than 100 titles / names
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"message": '❌ Expected a JSON object {"titles": [...], "members": [...]}.'}), 400
+    try:
+        titles = library.resolve_titles(payload.get("titles", []))
+        members = library.resolve_members(payload.get("members", []))
+    except ValueError as e:
+        return jsonify({"message": f"❌ {e}."}), 400
+    return jsonify({"titles": titles, "members": members}), 200
+
+
+def _batch(operation):
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get("member"), str):
+        return jsonify({"message": '❌ Expected a JSON object {"member": ..., "titles": [...]}.'}), 400
+    try:
+        results = operation(payload.get("titles", []), payload["member"])
+    except ValueError as e:
+        return jsonify({"message": f"❌ {e}."}), 400
+    return jsonify({"member": payload["member"], "results": results}), 200
+
+
+@app.route('/borrow/batch', methods=['POST'])
+def borrow_batch():
+    """
+    Borrow Several Books at Once
+    ---
+    consumes:
+      - application/json
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            member:
+              type: string
+            titles:
+              type: array
+              items:
+                type: string
+    responses:
+      200:
+        description: One result per title, in order; all loans are written in one transaction
+      400:
+        description: Malformed body or more than 100 titles
+    """
+    return _batch(library.borrow_many)
+
+
+@app.route('/return/batch', methods=['POST'])
+def return_batch():
+    """
+    Return Several Books at Once
+    ---
+    consumes:
+      - application/json
+    parameters:
+      - name: body
+        in: body
+        required: true
+        schema:
+          type: object
+          properties:
+            member:
+              type: string
+            titles:
+              type: array
+              items:
+                type: string
+    responses:
+      200:
+        description: One result per title, in order; all returns are written in one transaction
+      400:
+        description: Malformed body or more than 100 titles
+    """
+    return _batch(library.return_many)
+
+
+@app.route('/reports', methods=['GET'])
+def get_reports():
+    """
+    Library Reports
+    ---
+    parameters:
+      - name: extended
+        in: query
+        type: boolean
+        required: false
+        description: Include active/overdue loan counts and the per-genre breakdown
+    responses:
+      200:
+        description: Summary counters (cached for a few seconds, refreshed on writes)
+    """
+    extended = request.args.get("extended", "false").lower() in ("1", "true", "yes")
+    return jsonify(library.view_reports(extended=extended)), 200
+
+
+@app.route('/loans/open', methods=['GET'])
+def get_open_loans():
+    """
+    Open Loans (paginated)
+    ---
+    parameters:
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (default 100, max 1000)
+    responses:
+      200:
+        description: Loans not yet returned, with due dates, book titles and member names
+    """
+    after_id, limit = _page_args()
+    loans, next_cursor = _page(library.open_loans(after_id, limit + 1), limit)
+    return jsonify({"loans": loans, "next_cursor": next_cursor}), 200
+
+
+@app.route('/loans/overdue', methods=['GET'])
+def get_overdue_loans():
+    """
+    Overdue Loans (paginated)
+    ---
+    parameters:
+      - name: as_of
+        in: query
+        type: string
+        required: false
+        description: ISO date/time to check against (default now), e.g. 2025-01-31 or 2025-01-31T18:00:00; a UTC offset (2025-01-31T18:00:00+05:00) is converted to server local time
+      - name: after_id
+        in: query
+        type: integer
+        required: false
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        description: Page size (default 100, max 1000)
+    responses:
+      200:
+        description: Open loans past their due date
+      400:
+        description: Invalid as_of
+    """
+    as_of = request.args.get("as_of")
+    if as_of:
+        try:
+            as_of = datetime.fromisoformat(as_of)
+        except ValueError:
+            return jsonify({"message": f"❌ Invalid as_of '{as_of}'."}), 400
+    after_id, limit = _page_args()
+    loans, next_cursor = _page(library.overdue_loans(as_of or None, after_id, limit + 1), limit)
+    return jsonify({"loans": loans, "next_cursor": next_cursor}), 200
+
+
+@app.route('/books/bulk', methods=['POST'])
+def import_books():
+    """
+    Bulk Import Books
+    ---
+    consumes:
+      - multipart/form-data
+      - text/csv
+      - application/x-ndjson
+    parameters:
+      - name: file
+        in: formData
+        type: file
+        required: false
+        description: CSV with a title,author,genre header, or JSON Lines (the raw body is used when omitted)
+      - name: format
+        in: query
+        type: string
+        enum: [csv, jsonl]
+        required: false
+      - name: batch_size
+        in: query
+        type: integer
+        required: false
+    responses:
+      200:
+        description: Import report with inserted/failed counts and per-row errors
+      400:
+        description: Unsupported format
+    """
+    return _bulk_import(library.import_books)
+
+
+@app.route('/members/bulk', methods=['POST'])
+def import_members():
+    """
+    Bulk Import Members
+    ---
+    consumes:
+      - multipart/form-data
+      - text/csv
+      - application/x-ndjson
+    parameters:
+      - name: file
+        in: formData
+        type: file
+        required: false
+        description: CSV with a name,age,contact_info header, or JSON Lines (the raw body is used when omitted)
+      - name: format
+        in: query
+        type: string
+        enum: [csv, jsonl]
+        required: false
+      - name: batch_size
+        in: query
+        type: integer
+        required: false
+    responses:
+      200:
+        description: Import report with inserted/failed counts and per-row errors
+      400:
+        description: Unsupported format
+    """
+    return _bulk_import(library.import_members)
+
+
+@app.route('/export/<name>.ndjson', methods=['GET'])
+def export_ndjson(name):
+    """
+    Export a Table as NDJSON
+    ---
+    parameters:
+      - name: name
+        in: path
+        type: string
+        enum: [books, members, loans]
+        required: true
+    produces:
+      - application/x-ndjson
+    responses:
+      200:
+        description: Streams one JSON object per line; memory use does not grow with table size
+      404:
+        description: Unknown export
+    """
+    exporters = {
+        "books": library.export_books,
+        "members": library.export_members,
+        "loans": library.export_loans,
+    }
+    if name not in exporters:
+        return jsonify({"message": f"❌ Unknown export '{name}'."}), 404
+    rows = exporters[name]()
+    return Response((json.dumps(row, default=_json_default) + "\n" for row in rows), mimetype="application/x-ndjson")
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """
+    Metrics (Prometheus text format)
+    ---
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Per-statement SQL timings and row counts, slow statements and connection-pool waits
+    """
+    return Response(REGISTRY.render(), content_type=METRICS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -1,5 +1,6 @@
 import streamlit as st
 from library_core import *
+from library_records import to_frame
 from utils.index import schedule_clear_inputs, process_clear_queue
 
 # always call this early
@@ -53,7 +54,7 @@ elif menu == "View Books":
     st.subheader("View Books")
     all_books = view_books()
     if len(all_books) > 0:
-        st.table(all_books)
+        st.table(to_frame(all_books))
     else:
         st.write("Books List is empty")
     if st.button("Add Book"):
@@ -70,7 +71,7 @@ elif menu == "Borrow Book":
 elif menu == "Return Book":
     st.subheader("Return Book")
     member = st.selectbox("Select Member", [m["name"] for m in members])
-    borrowed_books = next((m["borrowed_books"] for m in members if m["name"] == member), [])
+    borrowed_books = sorted(next((m["borrowed_books"] for m in find_members(member or "")), []))
     book = st.selectbox("Select Book", borrowed_books)
     if st.button("Return Book"):
         st.success(return_book(book, member))
@@ -94,7 +95,7 @@ elif menu == "View Members":
     st.subheader("View Members")
     all_members = view_members()
     if len(all_members) > 0:
-        st.table(all_members)
+        st.table(to_frame(all_members))
     else:
         st.write("No Members Registered yet.")
     if st.button("Add Member"):
@@ -114,17 +115,12 @@ elif menu == "Reports & Queries":
 
     search_query = st.text_input("Enter book title or author name or genra", key="search_books")
     if search_query.strip():
-        # Case-insensitive partial match for title or author
-        results = [
-            b for b in all_books
-            if search_query.lower() in b["title"].lower()
-               or search_query.lower() in b["author"].lower()
-               or search_query.lower() in b["genre"].lower()
-        ]
+        # Case-insensitive partial match for title, author or genre
+        results = search_books(search_query)
 
         if results:
             st.success(f"✅ Found {len(results)} matching book(s):")
-            st.table(results)
+            st.table(to_frame(results))
         else:
             st.warning("⚠️ No books found matching your search.")
     else:
@@ -135,7 +131,7 @@ elif menu == "Reports & Queries":
         available_books = [b for b in all_books if not b["borrower"]]
         st.text("Available Books")
         if available_books:
-            st.table(available_books)
+            st.table(to_frame(available_books))
         else:
             st.info("All books are currently borrowed.")
     else:
@@ -146,7 +142,7 @@ elif menu == "Reports & Queries":
         borrowed_books_members = [m for m in all_members if m["borrowed_books"]]
         st.text("Members Who Borrowed Books")
         if borrowed_books_members:
-            st.table(borrowed_books_members)
+            st.table(to_frame(borrowed_books_members))
         else:
             st.info("No members have borrowed books yet.")
     else:
@@ -1,16 +1,16 @@
 import streamlit as st
-from library_db import init_db
 from library_core_oops import Library
+from library_records import to_frame
 import inspect
 
-# Run init_db() once per session
-if "db_initialized" not in st.session_state:
-    init_db()
-    st.session_state.db_initialized = True
-    st.info("✅ Library database initialized.")
 
-# Now safely use your Library class
-library = Library()
+@st.cache_resource
+def get_library():
+    """One Library (and its read cache) per server process; init_db runs only here."""
+    return Library()
+
+
+library = get_library()
 
 menu_options = ["Dashboard Home", "Add Book", "Register Member", "Borrow Book", "Return Book", "View Books", "View Members", "Reports & Queries", "🧩 DB Debug Panel"]
 
@@ -25,8 +25,6 @@ menu = st.session_state.menu
 # st.write("📚 Library class methods:", dir(Library))
 # print(library.view_books()[0])
 # print(library.view_reports())
-print(library.delete_book(2))  # change to an existing book ID
-print(library.view_books())
 
 if menu == "Add Book":
     st.subheader("➕ Add a New Book")
@@ -93,18 +91,16 @@ elif menu == "Return Book":
 elif menu == "View Books":
     st.subheader("📚 All Books")
 
-    # --- Always pull fresh data from the DB ---
-    books = library.view_books()
+    # --- Read straight into a DataFrame (cached until the next write) ---
+    df = library.books_frame()
 
-    if not books:
+    if df.empty:
         st.info("No books found in the library database.")
     else:
-        import pandas as pd
-        df = pd.DataFrame(books)
         st.dataframe(df)
 
         st.markdown("### 🗑️ Delete a Book")
-        book_titles = [f"{b['id']} — {b['title']} ({b['author']})" for b in books]
+        book_titles = [f"{i} — {t} ({a})" for i, t, a in zip(df["id"], df["title"], df["author"])]
         book_choice = st.selectbox("Select a book to delete", book_titles)
 
         selected_id = int(book_choice.split(" — ")[0])
@@ -139,15 +135,13 @@ elif menu == "View Members":
     st.subheader("View Members")
     all_members = library.view_members()
     if all_members:
-        st.table(all_members)
+        st.table(to_frame(all_members))
     else:
         st.info("No members found in the library database.")
 
 elif menu == "Reports & Queries":
     st.subheader("📊 Reports & Queries")
 
-    all_books = library.view_books()
-    all_members = library.view_members()
     reports = library.view_reports()
 
     # Summary metrics
@@ -159,13 +153,23 @@ elif menu == "Reports & Queries":
 
     st.divider()
 
+    # Overdue loans (open loans past their due date)
+    st.markdown("### ⏰ Overdue Loans")
+    overdue = library.overdue_loans(limit=100)
+    if overdue:
+        st.table(to_frame(overdue))
+    else:
+        st.success("No overdue loans.")
+
+    st.divider()
+
     # Search feature
     search = st.text_input("🔍 Search by Title or Author")
     if search.strip():
-        filtered = [b for b in all_books if search.lower() in b["title"].lower() or search.lower() in b["author"].lower()]
+        filtered = library.search_books(search, limit=50)
         if filtered:
             st.success(f"Found {len(filtered)} matching book(s):")
-            st.table(filtered)
+            st.table(to_frame(filtered))
         else:
             st.warning("No matching results found.")
 
@@ -175,7 +179,6 @@ elif menu == "Dashboard Home":
 
     # --- Load live data from the database ---
     reports = library.view_reports()
-    all_books = library.view_books()
     all_members = library.view_members()
 
     # --- Summary Metrics ---
@@ -207,14 +210,11 @@ elif menu == "Dashboard Home":
 
     st.divider()
 
-    # --- Chart 2: Genre-wise Book Distribution ---
-    import pandas as pd
-
+    # --- Chart 2: Genre-wise Book Distribution (aggregated in SQL) ---
     st.markdown("#### 📚 Books by Genre")
-    df = pd.DataFrame(all_books)
+    genre_count = library.genre_counts().set_index("genre")["count"]
 
-    if not df.empty:
-        genre_count = df["genre"].value_counts()
+    if not genre_count.empty:
         st.bar_chart(genre_count)
     else:
         st.info("No books available to display genre distribution.")
@@ -226,15 +226,13 @@ elif menu == "Dashboard Home":
     borrowed_members = [m for m in all_members if m.get("borrowed_books", [])]
 
     if borrowed_members:
-        st.table(borrowed_members)
+        st.table(to_frame(borrowed_members))
     else:
         st.info("No active borrowed members at the moment.")
 
 elif menu == "Reports & Queries":
     st.title("📊 Reports & Queries")
 
-    all_books = library.view_books()
-    all_members = library.view_members()
     reports = library.view_reports()
 
     # --- Summary metrics ---
@@ -249,28 +247,11 @@ elif menu == "Reports & Queries":
     # --- Borrowed Books Summary Table ---
     st.markdown("### 🔄 Borrowed Books Summary")
 
-    from library_db import execute_query
-    import pandas as pd
-
-    borrowed_records = execute_query("""
-        SELECT 
-            bb.id AS record_id,
-            b.title AS book_title,
-            m.name AS member_name,
-            bb.borrow_date,
-            bb.return_date
-        FROM borrowed_books bb
-        JOIN books b ON bb.book_id = b.id
-        JOIN members m ON bb.member_id = m.id
-        ORDER BY bb.id DESC
-    """, fetch=True)
-
-    if borrowed_records:
-        # Replace NULL return dates with a friendly message
-        for record in borrowed_records:
-            record["return_date"] = record["return_date"] or "⏳ Not Returned Yet"
-
-        df = pd.DataFrame(borrowed_records)
+    df = library.loans_frame()
+
+    if not df.empty:
+        # Replace NULL return dates with a friendly message (on a copy; the frame is cached)
+        df = df.assign(return_date=df["return_date"].fillna("⏳ Not Returned Yet"))
         st.dataframe(df, use_container_width=True)
         st.caption(f"Total Transactions: {len(df)}")
     else:
@@ -282,14 +263,10 @@ elif menu == "Reports & Queries":
     st.markdown("### 🔍 Search Books by Title or Author")
     search_term = st.text_input("Enter search keyword:")
     if search_term.strip():
-        filtered = [
-            b for b in all_books
-            if search_term.lower() in b["title"].lower()
-            or search_term.lower() in b["author"].lower()
-        ]
+        filtered = library.search_books(search_term, limit=50)
         if filtered:
             st.success(f"Found {len(filtered)} matching book(s):")
-            st.table(filtered)
+            st.table(to_frame(filtered))
         else:
             st.warning("No matches found.")
 
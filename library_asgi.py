@@ -0,0 +1,255 @@
+# library_asgi.py
+"""Async (ASGI) serving mode for the Library API.
+
+Serves the same routes as library_api (the Flask app is reused as-is), but
+requests are accepted on an asyncio event loop and the blocking Flask/SQLite
+work runs on a bounded thread pool:
+
+- at most `max_workers` requests hold a database connection at once. A
+  streamed body (the NDJSON exports) keeps its connection until the last
+  chunk is sent, so it holds its slot until then too. The default leaves one
+  of library_db.POOL_SIZE connections for the write-behind writer, so
+  requests never wait for a connection;
+- at most `max_streams` streamed responses are open at once (fewer than
+  max_workers, so slow export clients cannot starve other requests); more
+  get 503;
+- at most `max_pending` requests are admitted (running, queued or still
+  streaming); the rest are rejected straight away with 503 and a
+  Retry-After header;
+- a request that produces no response within `timeout` seconds gets 504.
+
+Run with any ASGI server, e.g. `uvicorn library_asgi:app --workers 1`, or
+`python library_asgi.py` (needs uvicorn).
+"""
+import asyncio
+import io
+import json
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from library_db import POOL_SIZE
+
+ASGI_WORKERS = int(os.environ.get("LIBRARY_ASGI_WORKERS", POOL_SIZE - 1))  # one connection left for the writer
+ASGI_MAX_STREAMS = int(os.environ.get("LIBRARY_ASGI_MAX_STREAMS", max(1, ASGI_WORKERS // 2)))
+ASGI_MAX_PENDING = int(os.environ.get("LIBRARY_ASGI_MAX_PENDING", ASGI_WORKERS * 8))
+ASGI_TIMEOUT = float(os.environ.get("LIBRARY_ASGI_TIMEOUT", 30))
+
+_END = object()
+
+
+class LibraryASGI:
+    """ASGI adapter running a WSGI app on a bounded executor with admission control."""
+
+    def __init__(self, wsgi_app, max_workers=ASGI_WORKERS, max_pending=ASGI_MAX_PENDING, timeout=ASGI_TIMEOUT,
+                 max_streams=None, on_shutdown=None):
+        self.wsgi_app = wsgi_app
+        self.max_pending = max_pending
+        self.max_streams = max(1, min(max_streams or ASGI_MAX_STREAMS, max_workers - 1))
+        self.timeout = timeout
+        self.on_shutdown = on_shutdown
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="library-asgi")
+        self._slots = asyncio.Semaphore(max_workers)
+        self.pending = 0
+        self.streams = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._lifespan(receive, send)
+        elif scope["type"] == "http":
+            await self._http(scope, receive, send)
+        else:
+            raise ValueError(f"Unsupported ASGI scope type '{scope['type']}'")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                self.close()
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if self.on_shutdown is not None:
+            self.on_shutdown()
+
+    async def _http(self, scope, receive, send):
+        if self.pending >= self.max_pending:
+            await _send_json(send, 503, {"message": "❌ Server busy, retry shortly."}, [(b"retry-after", b"1")])
+            return
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        try:
+            body = await _read_body(receive)
+            await asyncio.wait_for(self._slots.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.pending -= 1
+            await _send_json(send, 504, {"message": "❌ Request timed out."})
+            return
+        except BaseException:
+            self.pending -= 1
+            raise
+        # From here the request holds a slot and counts as pending until its
+        # response is closed: a streamed body keeps its pooled connection between
+        # chunks, and a timed out request still occupies a worker thread.
+        response = _WSGIResponse(self.wsgi_app, _environ(scope, body))
+        future = self.executor.submit(response.start)
+        try:
+            first = await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            future.add_done_callback(lambda _: self._close_later(response, loop))
+            await _send_json(send, 504, {"message": "❌ Request timed out."})
+            return
+        except Exception:
+            await self._finish(response, loop)
+            await _send_json(send, 500, {"message": "❌ Internal server error."})
+            return
+        except BaseException:
+            future.add_done_callback(lambda _: self._close_later(response, loop))
+            raise
+
+        # Responses without a Content-Length are streamed generators
+        streamed = first is not _END and not any(name == b"content-length" for name, _ in response.headers)
+        if streamed and self.streams >= self.max_streams:
+            await self._finish(response, loop)
+            await _send_json(send, 503, {"message": "❌ Too many exports in progress, retry shortly."},
+                             [(b"retry-after", b"1")])
+            return
+        self.streams += streamed
+        chunk = first
+        try:
+            await send({"type": "http.response.start", "status": response.status, "headers": response.headers})
+            # Streamed bodies are pulled one chunk at a time
+            while chunk is not _END:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                chunk = await loop.run_in_executor(self.executor, response.next_chunk)
+        finally:
+            self.streams -= streamed
+            await self._finish(response, loop)
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+    async def _finish(self, response, loop):
+        try:
+            await loop.run_in_executor(self.executor, response.close)
+        finally:
+            self._done()
+
+    def _close_later(self, response, loop):
+        """Close a response whose request was abandoned, on the worker thread that ran it."""
+        try:
+            response.close()
+        finally:
+            try:
+                loop.call_soon_threadsafe(self._done)
+            except RuntimeError:
+                pass  # the event loop has already shut down
+
+    def _done(self):
+        self.pending -= 1
+        self._slots.release()
+
+
+class _WSGIResponse:
+    """Drives one WSGI call: start() runs the app up to its first body chunk."""
+
+    def __init__(self, wsgi_app, environ):
+        self.wsgi_app = wsgi_app
+        self.environ = environ
+        self.status = 500
+        self.headers = []
+        self._iterable = None
+        self._chunks = None
+
+    def _start_response(self, status, headers, exc_info=None):
+        self.status = int(status.split(" ", 1)[0])
+        self.headers = [(name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in headers]
+
+    def start(self):
+        self._iterable = self.wsgi_app(self.environ, self._start_response)
+        self._chunks = iter(self._iterable)
+        return self.next_chunk()
+
+    def next_chunk(self):
+        for chunk in self._chunks:
+            if chunk:
+                return chunk
+        return _END
+
+    def close(self):
+        if hasattr(self._iterable, "close"):
+            self._iterable.close()
+            self._iterable = None
+
+
+async def _read_body(receive):
+    chunks = []
+    more_body = True
+    while more_body:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        more_body = message.get("more_body", False)
+    return b"".join(chunks)
+
+
+def _environ(scope, body):
+    """Build a WSGI environ from an ASGI http scope and the full request body."""
+    server_name, server_port = scope.get("server") or ("localhost", 80)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": server_name,
+        "SERVER_PORT": str(server_port),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    if scope.get("client"):
+        environ["REMOTE_ADDR"] = scope["client"][0]
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name == "CONTENT_TYPE":
+            environ["CONTENT_TYPE"] = value
+        elif name != "CONTENT_LENGTH":
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def _send_json(send, status, payload, headers=()):
+    body = json.dumps(payload).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()), *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def create_app(**options):
+    """Wrap library_api's Flask app; options override the LIBRARY_ASGI_* settings."""
+    import library_api
+    return LibraryASGI(library_api.app, on_shutdown=library_api.library.close, **options)
+
+
+def __getattr__(name):
+    # `uvicorn library_asgi:app` builds the app on first access, not at import
+    if name == "app":
+        globals()["app"] = app = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("library_asgi:app", host="127.0.0.1", port=int(os.environ.get("PORT", 8000)))
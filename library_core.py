@@ -1,69 +1,177 @@
+import os
+from collections import Counter
 from library_db import init_db, seed_data
+from library_records import BookRecord, BorrowerRecord, to_columns
 # Book Data Structures & Preparation (Sample)
 # books = [
 #     {"id": 1, "title": "The Alchemist", "author": "Paulo Coelho", "genre": "fantasy", "available": True, "borrower": None},
 #     {"id": 2, "title": "Atomic Habits", "author": "James Clear", "genre": "science fiction", "available": False, "borrower": "Arun"},
 # ]
-
-books = []
-book_id = 1
 # Member Data Structures & Preparation (Sample)
 # members = [
-#     {"id": 1, "name": "Arun", age=22, contact_info="", "borrowed_books": []},
-#     {"id": 2, "name": "Priya", age=30, contact_info="", "borrowed_books": []},
+#     {"id": 1, "name": "Arun", age=22, contact_info="", "borrowed_books": Counter({"Atomic Habits": 1})},
+#     {"id": 2, "name": "Priya", age=30, contact_info="", "borrowed_books": Counter()},
 # ]
-members = []
-member_id = 1
+
+class LibraryStore:
+    """In-memory books and members with hash indexes for the borrow/return lookups.
+
+    `books` and `members` keep insertion order for listing; lookups go through
+    id-keyed maps and case-folded title / member-name indexes, so borrowing and
+    returning cost O(copies of that title) instead of a scan of every record.
+    Books and members are slots-backed BookRecord / BorrowerRecord objects that
+    read like dicts. Each member's `borrowed_books` is a Counter of the titles
+    it holds and how many copies of each.
+
+    Report counters (borrowed copies, copies per genre) are maintained as books
+    change, so view_reports is O(1). With self_check=True every report is also
+    recomputed from scratch and compared, which is meant for tests.
+    """
+
+    def __init__(self, self_check=False):
+        self.books = []
+        self.members = []
+        self.self_check = self_check
+        self.clear()
+
+    def clear(self):
+        # Lists are cleared in place so module-level aliases stay valid
+        self.books.clear()
+        self.members.clear()
+        self.books_by_id = {}
+        self.members_by_id = {}
+        self._books_by_title = {}    # casefolded title -> [book, ...] (one per copy)
+        self._members_by_name = {}   # casefolded name -> [member, ...]
+        self._next_book_id = 1
+        self._next_member_id = 1
+        self._borrowed_count = 0
+        self._genre_counts = Counter()
+
+    def add_book(self, title, author, genre):
+        new_book = BookRecord(self._next_book_id, title, author, genre, True, "")
+        self.books.append(new_book)
+        self.books_by_id[new_book["id"]] = new_book
+        self._books_by_title.setdefault(title.casefold(), []).append(new_book)
+        self._genre_counts[genre] += 1
+        self._next_book_id += 1
+        return f"Book title: '{title}' successfully added"
+
+    def register_member(self, member_name, age, contact_info):
+        new_member = BorrowerRecord(self._next_member_id, member_name, int(age), int(contact_info), Counter())
+        self.members.append(new_member)
+        self.members_by_id[new_member["id"]] = new_member
+        self._members_by_name.setdefault(member_name.casefold(), []).append(new_member)
+        self._next_member_id += 1
+        return f"Member name: '{member_name}' successfully registered"
+
+    def find_books(self, title):
+        """All copies with this title (case-insensitive)."""
+        return self._books_by_title.get(title.casefold(), [])
+
+    def find_members(self, member_name):
+        """All members with this name (case-insensitive)."""
+        return self._members_by_name.get(member_name.casefold(), [])
+
+    def borrow_book(self, book_title, member_name):
+        copies = self.find_books(book_title)
+        if not copies:
+            return "Book not found."
+        book = next((b for b in copies if b["available"]), None)
+        if book is None:
+            return f"'{book_title}' is already borrowed."
+        book["available"] = False
+        book["borrower"] = member_name
+        self._borrowed_count += 1
+        for member in self.find_members(member_name):
+            member["borrowed_books"][book["title"]] += 1
+        return f"'{book_title}' borrowed by {member_name}."
+
+    def return_book(self, book_title, member_name):
+        copies = self.find_books(book_title)
+        if not copies:
+            return "Book not found."
+        # Prefer the copy this member holds, then any borrowed copy
+        book = (next((b for b in copies if not b["available"] and b["borrower"] == member_name), None)
+                or next((b for b in copies if not b["available"]), copies[0]))
+        if not book["available"]:
+            self._borrowed_count -= 1
+        book["available"] = True
+        book["borrower"] = None
+        for member in self.find_members(member_name):
+            held = member["borrowed_books"]
+            if held[book["title"]] > 1:
+                held[book["title"]] -= 1
+            else:
+                held.pop(book["title"], None)
+        return f"'{book_title}' returned by {member_name}."
+
+    def view_reports(self, extended=False):
+        if self.self_check:
+            self.check_counters()
+        total_books = len(self.books)
+        report = {"Total Books": total_books, "borrowed": self._borrowed_count,
+                  "available": total_books - self._borrowed_count}
+        if extended:
+            report["by_genre"] = dict(self._genre_counts)
+        return report
+
+    def check_counters(self):
+        """Recompute the report counters with a full scan; raise AssertionError if they drifted."""
+        borrowed = sum(not b["available"] for b in self.books)
+        genres = Counter(b["genre"] for b in self.books)
+        assert borrowed == self._borrowed_count, f"borrowed counter {self._borrowed_count} != {borrowed}"
+        assert genres == self._genre_counts, f"genre counters {dict(self._genre_counts)} != {dict(genres)}"
+
+
+_store = LibraryStore(self_check=os.environ.get("LIBRARY_CORE_SELF_CHECK") == "1")
+
+# Module-level views kept for callers that read the records directly
+books = _store.books
+members = _store.members
 
 def view_books():
     return books
 
+def book_columns():
+    """Books as parallel columns (array.array for id/available, lists otherwise)."""
+    return to_columns(books, BookRecord._fields)
+
 def add_book(title, author, genre):
-    global book_id
-    new_book = {"id": book_id, "title":title, "author":author, "genre": genre, "available": True, "borrower": ""}
-    books.append(new_book)
-    book_id += 1
-    return f"Book title: '{title}' successfully added"
+    return _store.add_book(title, author, genre)
 
 def borrow_book(book_title, member_name):
-    for book in books:
-        if book["title"].lower() == book_title.lower():
-            if not book["available"]:
-                return f"'{book_title}' is already borrowed."
-            book["available"] = False
-            book["borrower"] = member_name
-            for member in members:
-                if member["name"].lower() == member_name.lower():
-                    member["borrowed_books"].append(book_title)
-            return f"'{book_title}' borrowed by {member_name}."
-    return "Book not found."
+    return _store.borrow_book(book_title, member_name)
 
 def return_book(book_title, member_name):
-    for book in books:
-        if book["title"].lower() == book_title.lower():
-            book["available"] = True
-            book["borrower"] = None
-            for member in members:
-                if member["name"].lower() == member_name.lower():
-                    member["borrowed_books"].remove(book_title)
-            return f"'{book_title}' returned by {member_name}."
-    return "Book not found."
+    return _store.return_book(book_title, member_name)
 
 def register_member(member_name, age, contact_info):
-    global member_id
-    new_member = {"id": member_id, "name": member_name, "age":int(age), "contact_info":int(contact_info), "borrowed_books":[]}
-    members.append(new_member)
-    member_id += 1
-    return f"Member name: '{member_name}' successfully registered"
+    return _store.register_member(member_name, age, contact_info)
 
 def view_members():
     return members
 
-def view_reports():
-    total_books = len(books)
-    borrowed = sum(not b['available'] for b in books)
-    available = total_books - borrowed
-    return {"Total Books":total_books, "borrowed":borrowed, "available": available}
+def find_members(member_name):
+    return _store.find_members(member_name)
+
+def search_books(query):
+    """Case-insensitive partial match on title, author or genre."""
+    query = query.strip().lower()
+    if not query:
+        return []
+    return [
+        b for b in books
+        if query in b["title"].lower()
+           or query in b["author"].lower()
+           or query in b["genre"].lower()
+    ]
+
+def view_reports(extended=False):
+    return _store.view_reports(extended)
+
+def reset():
+    """Remove every book and member (used by tests)."""
+    _store.clear()
 
 if __name__ == "__main__":
     init_db()
@@ -1,7 +1,167 @@
-from library_db import init_db, seed_data, execute_query
-from datetime import datetime
+from library_db import (init_db, seed_data, execute_query, iter_query, fetch_frame, connection, transaction,
+                        configure, data_version, WriteBehindQueue, LOAN_PERIOD_DAYS, DATE_FORMAT)
+from library_records import BookRecord, MemberRecord, TitleRecord, LoanRecord, LoanDetailRecord, to_columns
+from datetime import datetime, timedelta
+import csv
+import functools
+import itertools
+import json
+import os
+import re
+import time
+import weakref
+import library_db
+
+IMPORT_FORMATS = ("csv", "jsonl")
+DEFAULT_IMPORT_BATCH_SIZE = 1000
+MAX_IMPORT_ERRORS = 100  # per-row errors kept in an import report; the rest are only counted
+CACHE_TTL = 5.0  # seconds a cached read is reused at most; any commit to the database invalidates it sooner
+CACHE_MAX_ENTRIES = 256
+MAX_BATCH_ITEMS = 100  # titles or names per batch call (borrow_many, resolve_titles, ...)
+
+GENRE_COUNTS_QUERY = """
+    SELECT COALESCE(NULLIF(genre, ''), 'Unspecified') AS genre, COUNT(*) AS count
+    FROM books GROUP BY 1 ORDER BY count DESC, genre
+"""
+
+
+def _read_records(stream, fmt):
+    """Yield (line_number, record) pairs from a CSV (with header row) or JSON Lines text stream.
+
+    Records that cannot be parsed are yielded as the exception instead of a dict.
+    """
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+    elif fmt == "jsonl":
+        for line_number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, e
+                continue
+            if not isinstance(record, dict):
+                record = ValueError("expected a JSON object")
+            yield line_number, record
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}', expected one of {IMPORT_FORMATS}")
+
+
+def _required(record, field):
+    value = str(record.get(field) or "").strip()
+    if not value:
+        raise ValueError(f"'{field}' is required")
+    return value
+
+
+def _book_row(record):
+    return _required(record, "title"), _required(record, "author"), str(record.get("genre") or "").strip()
+
+
+def _member_row(record):
+    age = record.get("age")
+    if age in (None, ""):
+        age = None
+    else:
+        try:
+            age = int(age)
+        except (TypeError, ValueError):
+            raise ValueError(f"'age' must be an integer, got {age!r}")
+    return _required(record, "name"), age, str(record.get("contact_info") or "").strip()
+
+
+def _bulk_insert(stream, fmt, batch_size, query, to_row):
+    """Stream-parse records and insert them with executemany in one transaction.
+
+    A stream that cannot be decoded or parsed at all (e.g. a Latin-1 file)
+    rolls the import back and raises ValueError naming the last line read.
+    """
+    report = {"inserted": 0, "failed": 0, "errors": []}
+    batch = []
+    line_number = 0
+    with transaction() as conn:
+        try:
+            for line_number, record in _read_records(stream, fmt):
+                try:
+                    if isinstance(record, Exception):
+                        raise record
+                    batch.append(to_row(record))
+                except ValueError as e:
+                    report["failed"] += 1
+                    if len(report["errors"]) < MAX_IMPORT_ERRORS:
+                        report["errors"].append({"line": line_number, "error": str(e)})
+                    continue
+                if len(batch) >= batch_size:
+                    conn.executemany(query, batch)
+                    report["inserted"] += len(batch)
+                    batch.clear()
+        except (UnicodeDecodeError, csv.Error) as e:
+            where = f" after line {line_number}" if line_number else ""
+            problem = "the file is not valid UTF-8" if isinstance(e, UnicodeDecodeError) else "unreadable CSV"
+            raise ValueError(f"{problem}{where} ({getattr(e, 'reason', e)}); nothing was imported") from e
+        if batch:
+            conn.executemany(query, batch)
+            report["inserted"] += len(batch)
+    return report
+
+
+def _cached(method):
+    """Serve a Library read method from the read-through cache.
+
+    Entries are tagged with the Library version and the database's
+    data_version at the time they were read. A write through the same Library
+    drops them, and a commit by any other connection or process (another
+    prefork worker, the Streamlit app) makes them stale on the next lookup.
+    Cached results are shared between callers and must be treated as read-only.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        # taken before reading so a concurrent write makes the new entry stale
+        version = (self._version, data_version())
+        entry = self._cache.get(key)
+        if entry and entry[0] == version and entry[1] > now:
+            return entry[2]
+        value = method(self, *args, **kwargs)
+        if len(self._cache) >= CACHE_MAX_ENTRIES:
+            self._cache.clear()
+        self._cache[key] = (version, now + CACHE_TTL, value)
+        return value
+    return wrapper
+
+
+def _page_query(query, after_id, limit):
+    """Add keyset pagination (id > after_id, ordered by id, optional LIMIT) to a SELECT."""
+    query += " WHERE id > ? ORDER BY id"
+    params = (after_id or 0,)
+    if limit is not None:
+        query += " LIMIT ?"
+        params += (limit,)
+    return query, params
+
+
+def _batch_items(items, what="titles"):
+    """Validate the list of titles (or names) of a batch call."""
+    if not isinstance(items, (list, tuple)) or not all(isinstance(item, str) and item for item in items):
+        raise ValueError(f"{what} must be a list of non-empty strings")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"at most {MAX_BATCH_ITEMS} {what} per batch")
+    return items
+
+
+def _wanted(items):
+    """VALUES clause (and params) numbering the items of a batch, for a `wanted(pos, ...)` CTE."""
+    values = "VALUES " + ", ".join(["(?, ?)"] * len(items))
+    return values, [value for item in enumerate(items) for value in item]
+
 
 class Book:
+    __slots__ = ("title", "author", "genre")
+
     def __init__(self, title, author, genre):
         self.title = title
         self.author = author
@@ -12,6 +172,8 @@ class Book:
         execute_query(query, (self.title, self.author, self.genre))
 
 class Member:
+    __slots__ = ("name", "age", "contact_info")
+
     def __init__(self, name, age, contact_info):
         self.name = name
         self.age = age
@@ -21,130 +183,583 @@ class Member:
         query = "INSERT into members (name, age, contact_info) VALUES (?, ?, ?)"
         execute_query(query, (self.name, self.age, self.contact_info))
 
+_open_libraries = weakref.WeakSet()  # Libraries not yet closed, with the database each was opened on
+
+
+def _same_path(a, b):
+    return os.path.abspath(a) == os.path.abspath(b)
+
+
 class Library:
-    def __init__(self):
+    def __init__(self, db_path=None, write_behind=False):
+        """write_behind=True routes borrow/return through a single writer thread
+        that commits bursts of them in group transactions (see WriteBehindQueue);
+        pass a dict to set its max_batch / max_delay / max_pending.
+
+        db_path is process-global: it calls library_db.configure, which moves
+        every Library in the process to that file. So it raises ValueError while
+        another open Library uses a different database; close that one first.
+        """
+        if db_path is not None and not _same_path(db_path, library_db.DB_NAME):
+            if any(_same_path(other._db_path, library_db.DB_NAME) for other in list(_open_libraries)):
+                raise ValueError(f"Another open Library uses '{library_db.DB_NAME}'; the database path is "
+                                 f"process-wide, so close it before opening '{db_path}'")
+            configure(db_path=db_path)
         init_db()
+        self._db_path = library_db.DB_NAME
+        _open_libraries.add(self)
+        self._writer = None
+        if write_behind:
+            self._writer = WriteBehindQueue(**(write_behind if isinstance(write_behind, dict) else {}))
+        self._cache = {}  # (method, args, kwargs) -> (version, expires_at, value)
+        self._versions = itertools.count(1)
+        self._version = next(self._versions)
+
+    def close(self):
+        """Flush and stop the write-behind writer, if one is running."""
+        _open_libraries.discard(self)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def _invalidate(self):
+        """Move to a new version after a write so every cached read is recomputed."""
+        self._version = next(self._versions)
+        self._cache.clear()
 
     # Add a new book
     def add_book(self, title, author, genre):
         Book(title, author, genre).save()
+        self._invalidate()
         return f"✅ Book '{title}' by {author} added successfully."
 
+    # Bulk import
+    def import_books(self, stream, fmt="csv", batch_size=DEFAULT_IMPORT_BATCH_SIZE):
+        """Import books (title, author, genre) from a CSV or JSON Lines text stream.
+
+        Valid rows are inserted in batches inside a single transaction; invalid
+        rows are skipped and reported as {"line": n, "error": "..."}. Raises
+        ValueError, importing nothing, if the stream itself cannot be read.
+        """
+        report = _bulk_insert(stream, fmt, batch_size,
+                              "INSERT into books (title, author, genre, available) VALUES (?, ?, ?, 1)", _book_row)
+        self._invalidate()
+        return report
+
+    def import_members(self, stream, fmt="csv", batch_size=DEFAULT_IMPORT_BATCH_SIZE):
+        """Import members (name, age, contact_info) the same way as import_books."""
+        report = _bulk_insert(stream, fmt, batch_size,
+                              "INSERT into members (name, age, contact_info) VALUES (?, ?, ?)", _member_row)
+        self._invalidate()
+        return report
+
     # Register new member
     def register_member(self, name, age, contact_info):
         Member(name, age, contact_info).register()
+        self._invalidate()
         return f"✅ Member '{name}' registered successfully."
 
+    # Writes that can go through the write-behind queue
+    def _write(self, operation, *args):
+        """Run operation(conn, *args) in one transaction, or hand it to the writer thread when enabled."""
+        if self._writer is not None:
+            result = self._writer.submit(operation, *args)
+        else:
+            with transaction() as conn:
+                result = operation(conn, *args)
+        self._invalidate()
+        return result
+
     # Borrow a book
     def borrow_book(self, book_title, member_name):
-        book = execute_query("SELECT id, available FROM books WHERE LOWER(title)=LOWER(?)", (book_title,), fetch=True)
-        member = execute_query("SELECT id FROM members WHERE LOWER(name)=LOWER(?)", (member_name,), fetch=True)
-
-        if not book:
+        """Borrow any free copy of a title in one transaction.
+
+        The title row carries an available-copy count, so a title with no free
+        copy is rejected without touching its copies, and a free copy is found
+        with one probe of the partial index on available copies.
+        """
+        return self._write(self._borrow, book_title, member_name)
+
+    @staticmethod
+    def _borrow(conn, book_title, member_name):
+        title = conn.execute(
+            "SELECT id, available_copies FROM titles WHERE LOWER(title)=LOWER(?) "
+            "ORDER BY available_copies > 0 DESC, id LIMIT 1", (book_title,)).fetchone()
+        member = conn.execute("SELECT id FROM members WHERE LOWER(name)=LOWER(?)", (member_name,)).fetchone()
+
+        if not title:
             return f"❌ Book '{book_title}' not found."
         if not member:
             return f"❌ Member '{member_name}' not found."
-        if book[0][1] == 0:
+        if not title["available_copies"]:
+            return f"⚠️ Book '{book_title}' is already borrowed."
+
+        copy = conn.execute("SELECT id FROM books WHERE title_id=? AND available=1 LIMIT 1", (title["id"],)).fetchone()
+        # Conditional claim: a concurrent borrower that got there first leaves rowcount at 0
+        claimed = copy and conn.execute("UPDATE books SET available=0, borrower=? WHERE id=? AND available=1",
+                                        (member_name, copy["id"])).rowcount
+        if not claimed:
             return f"⚠️ Book '{book_title}' is already borrowed."
 
-        execute_query("UPDATE books SET available=0, borrower=? WHERE id=?", (member_name, book[0][0]))
-        execute_query("INSERT INTO borrowed_books (book_id, member_id, borrow_date) VALUES (?, ?, ?)",
-                      (book[0][0], member[0][0], datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+        borrowed_at = datetime.now()
+        due_at = borrowed_at + timedelta(days=LOAN_PERIOD_DAYS)
+        conn.execute("INSERT INTO borrowed_books (book_id, member_id, borrow_date, due_date) VALUES (?, ?, ?, ?)",
+                     (copy["id"], member["id"], borrowed_at.strftime(DATE_FORMAT), due_at.strftime(DATE_FORMAT)))
 
         return f"✅ '{book_title}' borrowed by {member_name}."
 
     # Return a book
     def return_book(self, book_title, member_name):
-        """Mark a book as returned by a member."""
-        # Fetch book and member
-        book = execute_query("SELECT id FROM books WHERE LOWER(title)=LOWER(?)", (book_title,), fetch=True)
-        member = execute_query("SELECT id FROM members WHERE LOWER(name)=LOWER(?)", (member_name,), fetch=True)
-
-        if not book or not member:
-            return "❌ Book or Member not found."
+        """Mark the member's copy of a title as returned, in one transaction."""
+        return self._write(self._return, book_title, member_name)
 
-        book_id = book[0]["id"]
-        member_id = member[0]["id"]
+    @staticmethod
+    def _return(conn, book_title, member_name):
+        title = conn.execute("SELECT id FROM titles WHERE LOWER(title)=LOWER(?) LIMIT 1", (book_title,)).fetchone()
+        member = conn.execute("SELECT id FROM members WHERE LOWER(name)=LOWER(?)", (member_name,)).fetchone()
 
-        # Mark the book as available again
-        execute_query("UPDATE books SET available=1, borrower=NULL WHERE id=?", (book_id,))
+        if not title or not member:
+            return "❌ Book or Member not found."
 
-        # Update borrowed_books record
-        from datetime import datetime
-        execute_query(
+        # The member's open loan of any copy of this title
+        loan = conn.execute(
             """
-            UPDATE borrowed_books
-            SET return_date=?
-            WHERE book_id=? AND member_id=? AND return_date IS NULL
+            SELECT bb.id, bb.book_id
+            FROM borrowed_books bb
+            JOIN books b ON b.id = bb.book_id
+            WHERE bb.member_id=? AND bb.return_date IS NULL AND LOWER(b.title)=LOWER(?)
+            ORDER BY bb.id
+            LIMIT 1
             """,
-            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), book_id, member_id)
-        )
+            (member["id"], book_title)
+        ).fetchone()
+        closed = loan and conn.execute(
+            "UPDATE borrowed_books SET return_date=? WHERE id=? AND return_date IS NULL",
+            (datetime.now().strftime(DATE_FORMAT), loan["id"])
+        ).rowcount
+        if not closed:
+            return f"⚠️ '{book_title}' is not borrowed by {member_name}."
+
+        # Mark the copy as available again
+        conn.execute("UPDATE books SET available=1, borrower=NULL WHERE id=?", (loan["book_id"],))
 
         return f"✅ '{book_title}' returned by {member_name}."
 
+    # Borrow / return by id
+    def borrow_by_id(self, book_id, member_id):
+        """Borrow one specific copy for one member, both given by primary key.
+
+        Unlike borrow_book there is no title or name matching: the claim is a
+        single primary-key UPDATE, and the book and member are only looked up
+        again to explain a failure.
+        """
+        return self._write(self._borrow_by_id, book_id, member_id)
+
+    @staticmethod
+    def _borrow_by_id(conn, book_id, member_id):
+        claimed = conn.execute(
+            "UPDATE books SET available=0, borrower=(SELECT name FROM members WHERE id=:member) "
+            "WHERE id=:book AND available=1 AND EXISTS (SELECT 1 FROM members WHERE id=:member)",
+            {"book": book_id, "member": member_id}).rowcount
+        if not claimed:
+            if not conn.execute("SELECT 1 FROM books WHERE id=?", (book_id,)).fetchone():
+                return f"❌ Book #{book_id} not found."
+            if not conn.execute("SELECT 1 FROM members WHERE id=?", (member_id,)).fetchone():
+                return f"❌ Member #{member_id} not found."
+            return f"⚠️ Book #{book_id} is already borrowed."
+
+        borrowed_at = datetime.now()
+        due_at = borrowed_at + timedelta(days=LOAN_PERIOD_DAYS)
+        conn.execute("INSERT INTO borrowed_books (book_id, member_id, borrow_date, due_date) VALUES (?, ?, ?, ?)",
+                     (book_id, member_id, borrowed_at.strftime(DATE_FORMAT), due_at.strftime(DATE_FORMAT)))
+        return f"✅ Book #{book_id} borrowed by member #{member_id}."
+
+    def return_by_id(self, book_id, member_id):
+        """Close the member's open loan of one specific copy, both given by primary key."""
+        return self._write(self._return_by_id, book_id, member_id)
+
+    @staticmethod
+    def _return_by_id(conn, book_id, member_id):
+        closed = conn.execute(
+            "UPDATE borrowed_books SET return_date=? WHERE book_id=? AND member_id=? AND return_date IS NULL",
+            (datetime.now().strftime(DATE_FORMAT), book_id, member_id)).rowcount
+        if not closed:
+            if not conn.execute("SELECT 1 FROM books WHERE id=?", (book_id,)).fetchone():
+                return f"❌ Book #{book_id} not found."
+            return f"⚠️ Book #{book_id} is not borrowed by member #{member_id}."
+
+        conn.execute("UPDATE books SET available=1, borrower=NULL WHERE id=?", (book_id,))
+        return f"✅ Book #{book_id} returned by member #{member_id}."
+
+    def resolve_titles(self, book_titles):
+        """Map each title to the ids of its copies (free copies first), in one query.
+
+        Titles match case-insensitively, as in borrow_book; every matching copy is
+        listed so callers can see duplicates instead of one being picked for them.
+        Unknown titles map to an empty list.
+        """
+        resolved = {title: [] for title in _batch_items(book_titles)}
+        if resolved:
+            wanted, params = _wanted(list(resolved))
+            for row in execute_query(
+                    f"WITH wanted(pos, title) AS ({wanted}) "
+                    "SELECT w.title AS wanted, b.id FROM wanted w JOIN books b ON LOWER(b.title)=LOWER(w.title) "
+                    "ORDER BY w.pos, b.available DESC, b.id", params, fetch=True):
+                resolved[row["wanted"]].append(row["id"])
+        return resolved
+
+    def resolve_members(self, member_names):
+        """Map each member name to the ids of all members with that name, in one query."""
+        resolved = {name: [] for name in _batch_items(member_names, "names")}
+        if resolved:
+            wanted, params = _wanted(list(resolved))
+            for row in execute_query(
+                    f"WITH wanted(pos, name) AS ({wanted}) "
+                    "SELECT w.name AS wanted, m.id FROM wanted w JOIN members m ON LOWER(m.name)=LOWER(w.name) "
+                    "ORDER BY w.pos, m.id", params, fetch=True):
+                resolved[row["wanted"]].append(row["id"])
+        return resolved
+
+    # Batch borrow / return (self-checkout)
+    def borrow_many(self, book_titles, member_name):
+        """Borrow a free copy of each title for one member, all in one transaction.
+
+        Titles, free copies and the member are resolved with a fixed number of
+        set-based queries however many titles are given. Returns one
+        {"title", "message"} result per title, in order; a title that cannot be
+        borrowed does not stop the others.
+        """
+        book_titles = _batch_items(book_titles)
+        if not book_titles:
+            return []
+        return self._write(self._borrow_many, book_titles, member_name)
+
+    @staticmethod
+    def _borrow_many(conn, book_titles, member_name):
+        member = conn.execute("SELECT id FROM members WHERE LOWER(name)=LOWER(?)", (member_name,)).fetchone()
+        if not member:
+            return [{"title": t, "message": f"❌ Member '{member_name}' not found."} for t in book_titles]
+
+        wanted, params = _wanted(book_titles)
+        # Best title row per position: one with free copies first, like _borrow
+        titles = {}
+        for row in conn.execute(
+                f"WITH wanted(pos, title) AS ({wanted}) "
+                "SELECT w.pos, t.id, t.available_copies FROM wanted w "
+                "JOIN titles t ON LOWER(t.title)=LOWER(w.title) "
+                "ORDER BY w.pos, t.available_copies > 0 DESC, t.id", params):
+            titles.setdefault(row["pos"], row)
+
+        # Up to len(book_titles) free copies of each wanted title, oldest copy first
+        title_ids = sorted({row["id"] for row in titles.values() if row["available_copies"]})
+        free = {title_id: [] for title_id in title_ids}
+        if title_ids:
+            for row in conn.execute(
+                    "SELECT id, title_id FROM ("
+                    "  SELECT id, title_id, ROW_NUMBER() OVER (PARTITION BY title_id ORDER BY id) AS n FROM books"
+                    f"  WHERE available=1 AND title_id IN ({', '.join('?' * len(title_ids))})"
+                    ") WHERE n <= ? ORDER BY title_id, id", (*title_ids, len(book_titles))):
+                free[row["title_id"]].append(row["id"])
+
+        results, claimed = [], []
+        for pos, book_title in enumerate(book_titles):
+            title = titles.get(pos)
+            copies = free.get(title["id"]) if title else None
+            if not title:
+                message = f"❌ Book '{book_title}' not found."
+            elif not copies:
+                message = f"⚠️ Book '{book_title}' is already borrowed."
+            else:
+                claimed.append(copies.pop(0))
+                message = f"✅ '{book_title}' borrowed by {member_name}."
+            results.append({"title": book_title, "message": message})
+
+        # The transaction holds the write lock since BEGIN IMMEDIATE, so copies read
+        # as free above are still free here
+        borrowed_at = datetime.now()
+        due_at = borrowed_at + timedelta(days=LOAN_PERIOD_DAYS)
+        conn.executemany("UPDATE books SET available=0, borrower=? WHERE id=? AND available=1",
+                         [(member_name, copy_id) for copy_id in claimed])
+        conn.executemany(
+            "INSERT INTO borrowed_books (book_id, member_id, borrow_date, due_date) VALUES (?, ?, ?, ?)",
+            [(copy_id, member["id"], borrowed_at.strftime(DATE_FORMAT), due_at.strftime(DATE_FORMAT))
+             for copy_id in claimed])
+        return results
+
+    def return_many(self, book_titles, member_name):
+        """Return the member's copies of several titles in one transaction.
+
+        Like borrow_many, the member's open loans are matched to the titles in
+        one set-based query; returns one {"title", "message"} result per title.
+        """
+        book_titles = _batch_items(book_titles)
+        if not book_titles:
+            return []
+        return self._write(self._return_many, book_titles, member_name)
+
+    @staticmethod
+    def _return_many(conn, book_titles, member_name):
+        member = conn.execute("SELECT id FROM members WHERE LOWER(name)=LOWER(?)", (member_name,)).fetchone()
+        wanted, params = _wanted(book_titles)
+        known = {row["pos"] for row in conn.execute(
+            f"WITH wanted(pos, title) AS ({wanted}) "
+            "SELECT w.pos FROM wanted w WHERE EXISTS (SELECT 1 FROM titles t WHERE LOWER(t.title)=LOWER(w.title))",
+            params)}
+        if not member:
+            return [{"title": t, "message": "❌ Book or Member not found."} for t in book_titles]
+
+        # The member's open loans of the wanted titles, oldest first
+        loans = {}
+        for row in conn.execute(
+                f"WITH wanted(pos, title) AS ({wanted}) "
+                "SELECT w.pos, bb.id, bb.book_id FROM wanted w "
+                "JOIN books b ON LOWER(b.title)=LOWER(w.title) "
+                "JOIN borrowed_books bb ON bb.book_id = b.id "
+                "WHERE bb.member_id=? AND bb.return_date IS NULL "
+                "ORDER BY w.pos, bb.id", (*params, member["id"])):
+            loans.setdefault(row["pos"], []).append(row)
+
+        results, closed, taken = [], [], set()
+        for pos, book_title in enumerate(book_titles):
+            # The same title listed twice returns two copies, never one loan twice
+            loan = next((loan for loan in loans.get(pos, ()) if loan["id"] not in taken), None)
+            if pos not in known:
+                message = "❌ Book or Member not found."
+            elif not loan:
+                message = f"⚠️ '{book_title}' is not borrowed by {member_name}."
+            else:
+                taken.add(loan["id"])
+                closed.append(loan)
+                message = f"✅ '{book_title}' returned by {member_name}."
+            results.append({"title": book_title, "message": message})
+
+        returned_at = datetime.now().strftime(DATE_FORMAT)
+        conn.executemany("UPDATE borrowed_books SET return_date=? WHERE id=? AND return_date IS NULL",
+                         [(returned_at, loan["id"]) for loan in closed])
+        conn.executemany("UPDATE books SET available=1, borrower=NULL WHERE id=?",
+                         [(loan["book_id"],) for loan in closed])
+        return results
+
     # Reports
-    def view_reports(self):
-        """Return library summary statistics."""
-        total_books = execute_query("SELECT COUNT(*) AS count FROM books", fetch=True)[0]["count"]
-        borrowed = execute_query("SELECT COUNT(*) AS count FROM books WHERE available=0", fetch=True)[0]["count"]
-        available = total_books - borrowed
-        total_members = execute_query("SELECT COUNT(*) AS count FROM members", fetch=True)[0]["count"]
-
-        return {
-            "Total Books": total_books,
-            "Borrowed": borrowed,
-            "Available": available,
-            "Total Members": total_members
-        }
+    @_cached
+    def view_reports(self, extended=False):
+        """Return library summary statistics.
+
+        All counters come from one aggregate query. With extended=True the report
+        also has active and overdue loan counts and a per-genre breakdown.
+        """
+        now = datetime.now().strftime(DATE_FORMAT)
+        with connection():
+            counts = execute_query(
+                """
+                SELECT
+                    (SELECT COUNT(*) FROM books) AS total_books,
+                    (SELECT COUNT(*) FROM books WHERE available=0) AS borrowed,
+                    (SELECT COUNT(*) FROM members) AS total_members,
+                    (SELECT COUNT(*) FROM borrowed_books WHERE return_date IS NULL) AS active_loans,
+                    (SELECT COUNT(*) FROM borrowed_books
+                     WHERE return_date IS NULL AND due_date < ?) AS overdue_loans
+                """,
+                (now,), fetch=True
+            )[0]
+            report = {
+                "Total Books": counts["total_books"],
+                "Borrowed": counts["borrowed"],
+                "Available": counts["total_books"] - counts["borrowed"],
+                "Total Members": counts["total_members"]
+            }
+            if extended:
+                report["Active Loans"] = counts["active_loans"]
+                report["Overdue Loans"] = counts["overdue_loans"]
+                genres = execute_query(GENRE_COUNTS_QUERY, fetch=True)
+                report["By Genre"] = {row["genre"]: row["count"] for row in genres}
+
+        return report
 
     # View all books
-    def view_books(self):
-        """Return all books as list of dictionaries."""
-        data = execute_query("SELECT id, title, author, genre, available, borrower FROM books", fetch=True)
-        # ✅ data is already list[dict], no need to unpack tuples
-        books = []
-        for row in data:
-            books.append({
-                "id": row["id"],
-                "title": row["title"],
-                "author": row["author"],
-                "genre": row["genre"],
-                "available": bool(row["available"]),
-                "borrower": row["borrower"]
-            })
+    @_cached
+    def view_books(self, after_id=None, limit=None):
+        """Return books as a list of BookRecord (dict-like, slots-backed), ordered by id.
+
+        Keyset pagination: pass the last id already seen as after_id to get the
+        next page of at most limit books. Without limit every book is returned.
+        """
+        query, params = _page_query("SELECT id, title, author, genre, available, borrower FROM books", after_id, limit)
+        books = execute_query(query, params, fetch=True, row_type=BookRecord)
+        for book in books:
+            book["available"] = bool(book["available"])
         return books
 
+    @_cached
+    def book_columns(self, after_id=None, limit=None):
+        """Return the same rows as view_books as parallel columns.
+
+        id and available are array.array columns, the text fields are lists;
+        this is the cheapest shape to hand to a chart or DataFrame.
+        """
+        query, params = _page_query("SELECT id, title, author, genre, available, borrower FROM books", after_id, limit)
+        with connection() as conn:
+            return to_columns(conn.execute(query, params), BookRecord._fields)
+
+    # Open and overdue loans
+    @_cached
+    def open_loans(self, after_id=None, limit=100):
+        """Loans not yet returned, with book title and member name, ordered by loan id.
+
+        Paginated like view_books; served by the partial index on open loans.
+        """
+        return self._loans_page("", (), after_id, limit)
+
+    @_cached
+    def overdue_loans(self, as_of=None, after_id=None, limit=100):
+        """Open loans whose due date is before as_of (a datetime or stored-format string, default now).
+
+        Due dates are stored in naive local time, so an as_of with a timezone is
+        converted to local time first.
+        """
+        if as_of is None:
+            as_of = datetime.now()
+        if isinstance(as_of, datetime):
+            if as_of.tzinfo is not None:
+                as_of = as_of.astimezone().replace(tzinfo=None)
+            as_of = as_of.strftime(DATE_FORMAT)
+        return self._loans_page("AND bb.due_date < ?", (as_of,), after_id, limit)
+
+    def _loans_page(self, condition, params, after_id, limit):
+        return execute_query(
+            f"""
+            SELECT bb.id, bb.book_id, bb.member_id, bb.borrow_date, bb.due_date, bb.return_date,
+                   b.title AS book_title, m.name AS member_name
+            FROM borrowed_books bb
+            JOIN books b ON b.id = bb.book_id
+            JOIN members m ON m.id = bb.member_id
+            WHERE bb.return_date IS NULL {condition} AND bb.id > ?
+            ORDER BY bb.id
+            LIMIT ?
+            """,
+            params + (after_id or 0, limit), fetch=True, row_type=LoanDetailRecord
+        )
+
+    # Columnar frames for the dashboards
+    @_cached
+    def books_frame(self, backend="pandas"):
+        """All books as a pandas DataFrame (backend="pandas") or pyarrow Table (backend="arrow")."""
+        frame = fetch_frame("SELECT id, title, author, genre, available != 0 AS available, borrower FROM books "
+                            "ORDER BY id", backend=backend)
+        if backend == "pandas":
+            frame["available"] = frame["available"].astype(bool)
+        else:
+            import pyarrow as pa
+            frame = frame.set_column(4, "available", frame["available"].cast(pa.bool_()))
+        return frame
+
+    @_cached
+    def members_frame(self, backend="pandas"):
+        """All members as a DataFrame or Arrow table."""
+        return fetch_frame("SELECT id, name, age, contact_info FROM members ORDER BY id", backend=backend)
+
+    @_cached
+    def loans_frame(self, backend="pandas"):
+        """Loan history joined with book titles and member names, newest first."""
+        return fetch_frame(
+            """
+            SELECT
+                bb.id AS record_id,
+                b.title AS book_title,
+                m.name AS member_name,
+                bb.borrow_date,
+                bb.due_date,
+                bb.return_date
+            FROM borrowed_books bb
+            JOIN books b ON bb.book_id = b.id
+            JOIN members m ON bb.member_id = m.id
+            ORDER BY bb.id DESC
+            """,
+            backend=backend
+        )
+
+    @_cached
+    def genre_counts(self, backend="pandas"):
+        """Books per genre, aggregated in SQL (columns: genre, count)."""
+        return fetch_frame(GENRE_COUNTS_QUERY, backend=backend)
+
+    # Titles with copy counts
+    @_cached
+    def view_titles(self, after_id=None, limit=None):
+        """Return titles with total and available copy counts, ordered by id (paginated like view_books)."""
+        query, params = _page_query(
+            "SELECT id, title, author, genre, total_copies, available_copies FROM titles", after_id, limit)
+        return execute_query(query, params, fetch=True, row_type=TitleRecord)
+
     # View all members
-    def view_members(self):
-        """Return all members as list of dictionaries."""
-        data = execute_query("SELECT id, name, age, contact_info FROM members", fetch=True)
-        members = []
-        for row in data:
-            members.append({
-                "id": row["id"],
-                "name": row["name"],
-                "age": row["age"],
-                "contact_info": row["contact_info"]
-            })
-        return members
+    @_cached
+    def view_members(self, after_id=None, limit=None):
+        """Return members as a list of MemberRecord, ordered by id (paginated like view_books)."""
+        query, params = _page_query("SELECT id, name, age, contact_info FROM members", after_id, limit)
+        return execute_query(query, params, fetch=True, row_type=MemberRecord)
+
+    # Full-text search
+    @_cached
+    def search_books(self, query, limit=20, offset=0):
+        """Search titles, authors and genres, best matches first.
+
+        Every word in the query must match the start of a word in the book
+        (prefix matching), so "atom hab" finds "Atomic Habits".
+        """
+        terms = re.findall(r"\w+", query or "")
+        if not terms:
+            return []
+        match = " ".join(f'"{term}"*' for term in terms)
+        books = execute_query(
+            """
+            SELECT b.id, b.title, b.author, b.genre, b.available, b.borrower
+            FROM books_fts
+            JOIN books b ON b.id = books_fts.rowid
+            WHERE books_fts MATCH ?
+            ORDER BY bm25(books_fts, 10.0, 5.0, 1.0)
+            LIMIT ? OFFSET ?
+            """,
+            (match, limit, offset), fetch=True, row_type=BookRecord
+        )
+        for book in books:
+            book["available"] = bool(book["available"])
+        return books
+
+    # Streaming exports
+    def export_books(self):
+        """Yield every book as a BookRecord without loading the table into memory."""
+        for book in iter_query("SELECT id, title, author, genre, available, borrower FROM books ORDER BY id",
+                               row_type=BookRecord):
+            book["available"] = bool(book["available"])
+            yield book
+
+    def export_members(self):
+        """Yield every member as a MemberRecord without loading the table into memory."""
+        return iter_query("SELECT id, name, age, contact_info FROM members ORDER BY id", row_type=MemberRecord)
+
+    def export_loans(self):
+        """Yield the full borrowed_books history as LoanRecord without loading it into memory."""
+        return iter_query("SELECT id, book_id, member_id, borrow_date, due_date, return_date FROM borrowed_books "
+                          "ORDER BY id", row_type=LoanRecord)
 
     def delete_book(self, book_id: int):
         """Delete a book and any related borrowed_books entries."""
-        book = execute_query("SELECT id, title, available FROM books WHERE id=?", (book_id,), fetch=True)
-        if not book:
-            return f"❌ Book with ID {book_id} not found."
+        with transaction() as conn:
+            book = conn.execute("SELECT id, title FROM books WHERE id=?", (book_id,)).fetchone()
+            if not book:
+                return f"❌ Book with ID {book_id} not found."
 
-        book_id_db, title, available = book[0]["id"], book[0]["title"], book[0]["available"]
+            book_id_db, title = book["id"], book["title"]
 
-        # delete any borrowed_books entries referencing this book
-        execute_query("DELETE FROM borrowed_books WHERE book_id=?", (book_id_db,))
+            # delete any borrowed_books entries referencing this book
+            conn.execute("DELETE FROM borrowed_books WHERE book_id=?", (book_id_db,))
 
-        # delete the book record itself
-        execute_query("DELETE FROM books WHERE id=?", (book_id_db,))
+            # delete the book record itself
+            conn.execute("DELETE FROM books WHERE id=?", (book_id_db,))
 
+        self._invalidate()
         return f"🗑️ Book '{title}' (ID {book_id_db}) deleted successfully."
 
-
 if __name__ == "__main__":
     library = Library()
 
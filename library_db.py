@@ -1,19 +1,598 @@
 import sqlite3
+import threading
+import queue
+import time
+import functools
+import itertools
+import logging
+import re
+import weakref
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
 from datetime import datetime
 import os
+from library_metrics import REGISTRY
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
 
 DB_DIR = "db"
-os.makedirs(DB_DIR, exist_ok=True)
 
-DB_NAME = os.path.join(DB_DIR, "library.db")
+# Database file; override with LIBRARY_DB_PATH, configure(db_path=...) or Library(db_path=...).
+# The directory is created on first connect, not at import.
+DB_NAME = os.environ.get("LIBRARY_DB_PATH") or os.path.join(DB_DIR, "library.db")
 
-def init_db():
-    """Initialize database and create tables if not exists."""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
+# Loans are due this many days after they are borrowed.
+LOAN_PERIOD_DAYS = 14
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"  # stored dates sort and compare correctly as text
+
+# Upper bound on open connections per process; callers block once all are in use.
+POOL_SIZE = 8
+POOL_TIMEOUT = 30
+
+# Named pragma sets, picked with LIBRARY_DB_PROFILE or configure(profile=...).
+# WAL lets the API and the Streamlit app read while the other writes; with WAL,
+# synchronous=NORMAL only risks the last commits on power loss, never corruption.
+STORAGE_PROFILES = {
+    "default": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,      # KiB when negative, i.e. 64 MB page cache
+        "mmap_size": 268435456,    # 256 MB memory-mapped reads
+        "busy_timeout": 5000,      # ms to wait on a locked database before failing
+        "temp_store": "MEMORY",
+    },
+    "durable": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "busy_timeout": 5000,
+        "temp_store": "MEMORY",
+    },
+    "legacy": {  # SQLite's own defaults (rollback journal)
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+        "cache_size": -2000,
+        "mmap_size": 0,
+        "busy_timeout": 5000,
+        "temp_store": "DEFAULT",
+    },
+}
+
+_PRAGMA_CHOICES = {
+    "journal_mode": ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"),
+    "synchronous": ("OFF", "NORMAL", "FULL", "EXTRA"),
+    "temp_store": ("DEFAULT", "FILE", "MEMORY"),
+}
+_INT_PRAGMAS = ("cache_size", "mmap_size", "busy_timeout")
+
+_storage_profile = os.environ.get("LIBRARY_DB_PROFILE", "default")
+_storage_overrides = {}
+
+
+def _validate_pragma(name, value):
+    """Normalise a pragma value; pragmas cannot be bound as parameters, so only known values pass."""
+    if name in _INT_PRAGMAS:
+        return int(value)
+    if name in _PRAGMA_CHOICES:
+        value = str(value).upper()
+        if value not in _PRAGMA_CHOICES[name]:
+            raise ValueError(f"Invalid {name} '{value}', expected one of {_PRAGMA_CHOICES[name]}")
+        return value
+    raise ValueError(f"Unknown storage setting '{name}'")
+
+
+def storage_settings():
+    """Resolve the active pragmas: profile, then LIBRARY_DB_<PRAGMA> env vars, then configure() overrides."""
+    if _storage_profile not in STORAGE_PROFILES:
+        raise ValueError(f"Unknown storage profile '{_storage_profile}', expected one of {sorted(STORAGE_PROFILES)}")
+    settings = dict(STORAGE_PROFILES[_storage_profile])
+    for name in settings:
+        env_value = os.environ.get(f"LIBRARY_DB_{name.upper()}")
+        if env_value is not None:
+            settings[name] = env_value
+    settings.update(_storage_overrides)
+    return {name: _validate_pragma(name, value) for name, value in settings.items()}
+
+
+def configure(db_path=None, profile=None, **pragmas):
+    """Point library_db at another database file and/or change storage settings.
+
+    Pooled connections are closed so the next query opens them with the new settings.
+    """
+    global DB_NAME, _storage_profile
+    if profile is not None:
+        if profile not in STORAGE_PROFILES:
+            raise ValueError(f"Unknown storage profile '{profile}', expected one of {sorted(STORAGE_PROFILES)}")
+        _storage_profile = profile
+    for name, value in pragmas.items():
+        _storage_overrides[name] = _validate_pragma(name, value)
+    if db_path is not None:
+        DB_NAME = db_path
+    close_pool()
+
+
+# Query instrumentation. Statement timings, row counts and pool waits go to the
+# library_metrics registry (served by the API at /metrics). Statements whose
+# execute() takes SLOW_QUERY_MS or more are logged to the "library_db.slow"
+# logger, with their EXPLAIN QUERY PLAN when EXPLAIN_SLOW_QUERIES is set.
+INSTRUMENT = os.environ.get("LIBRARY_DB_INSTRUMENT", "1") != "0"
+SLOW_QUERY_MS = float(os.environ.get("LIBRARY_DB_SLOW_MS", 100))
+EXPLAIN_SLOW_QUERIES = os.environ.get("LIBRARY_DB_EXPLAIN") == "1"
+SLOW_QUERY_LOG_SIZE = 100  # slow statements kept for recent_slow_queries()
+ITER_BATCH_SIZE = 256  # rows fetched at a time when an instrumented cursor is iterated
+
+slow_query_log = logging.getLogger("library_db.slow")
+_slow_queries = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+STATEMENT_SECONDS = REGISTRY.histogram(
+    "library_db_statement_seconds", "Time spent in execute() per SQL statement (row fetches excluded).",
+    ["statement"])
+FETCH_SECONDS = REGISTRY.histogram(
+    "library_db_fetch_seconds", "Time spent fetching result rows per SQL statement.", ["statement"])
+ROWS = REGISTRY.counter(
+    "library_db_rows_total", "Rows returned by queries or changed by INSERT/UPDATE/DELETE.", ["statement"])
+SLOW_STATEMENTS = REGISTRY.counter(
+    "library_db_slow_statements_total", "Statements whose execute() took at least SLOW_QUERY_MS.", ["statement"])
+POOL_ACQUIRE_SECONDS = REGISTRY.histogram(
+    "library_db_pool_acquire_seconds", "Time spent waiting for a pooled connection.")
+
+_WHITESPACE = re.compile(r"\s+")
+_PARAM_LIST = re.compile(r"\?(?:\s*,\s*\?)+")
+_ROW_LIST = re.compile(r"\(\?\)(?:\s*,\s*\(\?\))+")
+
+
+@functools.lru_cache(maxsize=1024)
+def statement_label(sql):
+    """Normalise SQL into a metric label: one line, with variable-length ?-lists collapsed to one."""
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    return _ROW_LIST.sub("(?)", _PARAM_LIST.sub("?", sql))[:200]
+
+
+def sql_seconds():
+    """Total seconds this thread has spent executing and fetching SQL (instrumented connections only).
+
+    Callers take the difference around a unit of work, e.g. a request.
+    """
+    return getattr(_local, "sql_seconds", 0.0)
+
+
+def _add_sql_seconds(elapsed):
+    _local.sql_seconds = getattr(_local, "sql_seconds", 0.0) + elapsed
+
+
+def recent_slow_queries():
+    """The latest slow statements (oldest first) as dicts with statement, ms, at and plan."""
+    return list(_slow_queries)
+
+
+def _record_slow(conn, sql, params, elapsed):
+    label = statement_label(sql)
+    SLOW_STATEMENTS.inc(statement=label)
+    plan = None
+    if EXPLAIN_SLOW_QUERIES and not label.upper().startswith(("EXPLAIN", "PRAGMA", "BEGIN", "COMMIT", "ROLLBACK",
+                                                               "SAVEPOINT", "RELEASE", "ANALYZE")):
+        try:
+            # A plain sqlite3.Cursor, so the EXPLAIN itself is not instrumented
+            plan = [row[3] for row in sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        except sqlite3.Error:
+            pass
+    entry = {"statement": label, "ms": round(elapsed * 1000, 3),
+             "at": datetime.now().strftime(DATE_FORMAT), "plan": plan}
+    _slow_queries.append(entry)
+    # Parameters are left out of the log: they carry member names and contact details
+    slow_query_log.warning("slow query (%.1f ms): %s%s", entry["ms"], label,
+                           "".join(f"\n  plan: {step}" for step in plan or ()))
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor that records statement time, fetch time and row counts in the metrics registry."""
+    _label = None
+
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        super().execute(sql, parameters)
+        self._record(sql, parameters, time.perf_counter() - start)
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        start = time.perf_counter()
+        super().executemany(sql, seq_of_parameters)
+        self._record(sql, seq_of_parameters[0] if seq_of_parameters else (), time.perf_counter() - start)
+        return self
+
+    def _record(self, sql, parameters, elapsed):
+        self._label = statement_label(sql)
+        _add_sql_seconds(elapsed)
+        STATEMENT_SECONDS.observe(elapsed, statement=self._label)
+        if self.rowcount > 0:
+            ROWS.inc(self.rowcount, statement=self._label)
+        if elapsed * 1000 >= SLOW_QUERY_MS:
+            _record_slow(self.connection, sql, parameters, elapsed)
+
+    def _fetched(self, rows, elapsed):
+        _add_sql_seconds(elapsed)
+        if self._label is not None:
+            FETCH_SECONDS.observe(elapsed, statement=self._label)
+            if rows:
+                ROWS.inc(rows, statement=self._label)
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(row is not None, time.perf_counter() - start)
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), time.perf_counter() - start)
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), time.perf_counter() - start)
+        return rows
+
+    def __iter__(self):
+        # Iteration goes through fetchmany, and the batches' time and rows are
+        # recorded once when the loop ends, instead of one sample per row
+        rows = 0
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                batch = super().fetchmany(ITER_BATCH_SIZE)
+                elapsed += time.perf_counter() - start
+                if not batch:
+                    return
+                rows += len(batch)
+                yield from batch
+        finally:
+            self._fetched(rows, elapsed)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Connection whose cursors (including conn.execute shortcuts) are InstrumentedCursor."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections for one database file."""
+
+    def __init__(self, db_name, size=POOL_SIZE, settings=None):
+        self.db_name = db_name
+        self.size = size
+        self.settings = settings if settings is not None else storage_settings()
+        self.closed = False
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _connect(self):
+        """Open a connection with row access by name and pragmas applied once."""
+        directory = os.path.dirname(self.db_name)
+        if directory and not self.db_name.startswith(("file:", ":memory:")):
+            os.makedirs(directory, exist_ok=True)
+        factory = InstrumentedConnection if INSTRUMENT else sqlite3.Connection
+        conn = sqlite3.connect(self.db_name, isolation_level=None, check_same_thread=False, factory=factory)
+        conn.row_factory = sqlite3.Row  # ✅ makes cursor results behave like dicts
+        conn.execute("PRAGMA foreign_keys = ON")
+        for name, value in self.settings.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self, timeout=POOL_TIMEOUT):
+        start = time.perf_counter()
+        if not self._slots.acquire(timeout=timeout):
+            raise sqlite3.OperationalError("timed out waiting for a pooled connection")
+        POOL_ACQUIRE_SECONDS.observe(time.perf_counter() - start)
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            return self._connect()
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        if self.closed:
+            conn.close()
+        else:
+            self._idle.put(conn)
+        self._slots.release()
+
+    def close(self):
+        """Close idle connections; connections still in use are closed on release."""
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_pool():
+    """Return the pool for the current DB_NAME, replacing it if the path changed."""
+    global _pool
+    with _pool_lock:
+        if _pool is None or _pool.closed or _pool.db_name != DB_NAME:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DB_NAME)
+        return _pool
+
+
+_schema_ready = set()  # database files whose schema this process has already created or checked
+_schema_thread_lock = threading.Lock()
+_forked_state = []  # connections inherited over fork; kept referenced so the child never closes them
+
+
+@contextmanager
+def _schema_lock():
+    """Hold an exclusive lock on DB_NAME + ".lock" for schema creation.
+
+    flock is per open file, so this serialises threads and processes alike.
+    Where fcntl is unavailable only threads of this process are serialised;
+    the DDL itself still runs inside BEGIN IMMEDIATE, so concurrent processes
+    cannot corrupt the schema, they only repeat the IF NOT EXISTS checks.
+    """
+    with _schema_thread_lock:
+        if fcntl is None or DB_NAME.startswith(("file:", ":memory:")):
+            yield
+            return
+        directory = os.path.dirname(DB_NAME)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(DB_NAME + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _reset_after_fork():
+    """Give a forked child its own pool, thread state and writer threads.
+
+    SQLite connections must not be used across fork(), and closing them in
+    the child could release locks the parent still holds, so the inherited
+    pool is set aside untouched and the child opens fresh connections.
+    """
+    global _pool, _pool_lock, _local, _schema_thread_lock, _watch, _watch_lock
+    _forked_state.append((_pool, _local, _watch))
+    _pool = None
+    _watch = None
+    _watch_lock = threading.Lock()
+    _pool_lock = threading.Lock()
+    _schema_thread_lock = threading.Lock()
+    _local = threading.local()
+    for writer in list(_writers):
+        writer._start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def close_pool():
+    """Close every pooled connection (e.g. on shutdown or after switching databases)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+    _close_watch()
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection for the duration of the block.
+
+    Nested use on the same thread gets the connection already held, so every
+    query issued inside the block shares it.
+    """
+    held = getattr(_local, "conn", None)
+    if held is not None:
+        yield held
+        return
+    pool = get_pool()
+    conn = pool.acquire()
+    _local.conn = conn
+    try:
+        yield conn
+    finally:
+        _local.conn = None
+        pool.release(conn)
+
+
+@contextmanager
+def transaction():
+    """Run the block as one write transaction on a pooled connection.
+
+    Commits on success and rolls back on error. Nested blocks join the
+    transaction that is already open.
+    """
+    with connection() as conn:
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+
+# Change detection for read caches. PRAGMA data_version on one connection
+# changes whenever another connection commits to the database, from this
+# process or any other, so a cache can check for outside writes with one
+# cheap statement. The watching connection is private: pooled connections
+# would each report their own, unrelated values.
+_watch = None  # (db_name, connection, token prefix)
+_watch_lock = threading.Lock()
+_watch_opens = itertools.count(1)
+
+
+def data_version():
+    """Token that changes whenever any connection commits to DB_NAME; compare tokens for equality only."""
+    global _watch
+    with _watch_lock:
+        if _watch is None or _watch[0] != DB_NAME:
+            if _watch is not None:
+                _watch[1].close()
+            conn = sqlite3.connect(DB_NAME, isolation_level=None, check_same_thread=False)
+            _watch = (DB_NAME, conn, next(_watch_opens))
+        return _watch[2], _watch[1].execute("PRAGMA data_version").fetchone()[0]
 
-    # Create book table
-    cur.execute("""
+
+def _close_watch():
+    global _watch
+    with _watch_lock:
+        if _watch is not None:
+            _watch[1].close()
+            _watch = None
+
+
+_STOP = object()
+_writers = weakref.WeakSet()  # live WriteBehindQueues, restarted in forked children
+
+
+class WriteBehindQueue:
+    """Single writer thread that commits queued write operations in group transactions.
+
+    An operation is a callable taking the connection as its first argument.
+    Callers block in submit() until their operation has been committed. The
+    writer waits up to max_delay seconds for more operations to arrive, runs up
+    to max_batch of them in one BEGIN IMMEDIATE ... COMMIT, and so pays for one
+    fsync per group instead of one per operation. Each operation runs in its
+    own SAVEPOINT: one that raises is rolled back alone and its caller gets the
+    exception. The writer holds one pooled connection for its whole life, so
+    writes never contend with each other for the database lock.
+    """
+
+    def __init__(self, max_batch=64, max_delay=0.002, max_pending=10000):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self._start()
+        _writers.add(self)
+
+    def _start(self):
+        # Also called in a forked child, where the parent's writer thread does not exist
+        self._queue = queue.Queue(maxsize=self.max_pending)
+        self._thread = threading.Thread(target=self._run, name="library-db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, operation, *args, timeout=POOL_TIMEOUT):
+        """Queue operation(conn, *args) and wait for its committed result (or exception)."""
+        if not self._thread.is_alive():
+            raise RuntimeError("write-behind queue is closed")
+        future = Future()
+        try:
+            self._queue.put((operation, args, future), timeout=timeout)
+        except queue.Full:
+            raise sqlite3.OperationalError("write-behind queue is full") from None
+        return future.result(timeout)
+
+    def close(self):
+        """Commit everything already queued, then stop the writer thread."""
+        _writers.discard(self)
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        with connection() as conn:
+            stopping = False
+            while not stopping:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                deadline = time.monotonic() + self.max_delay
+                while len(batch) < self.max_batch:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+
+    def _commit(self, conn, batch):
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for operation, args, future in batch:
+                conn.execute("SAVEPOINT write_behind_op")
+                try:
+                    result = operation(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_behind_op")
+                    outcomes.append((future, None, e))
+                else:
+                    outcomes.append((future, result, None))
+                conn.execute("RELEASE write_behind_op")
+            conn.commit()
+        except Exception as e:
+            # The group itself failed (e.g. disk I/O): nothing was committed
+            if conn.in_transaction:
+                conn.rollback()
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        # Results are only handed out once the group is durable
+        for future, result, error in outcomes:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+# Schema migrations. The database's PRAGMA user_version is the number of steps
+# it has applied; init_db applies the rest in order, one transaction per step.
+# Append new steps at the end and never edit or reorder steps that have shipped.
+# Steps also run against databases created before versioning (user_version 0),
+# whose tables may already exist, so they check before creating or altering.
+MIGRATIONS = []
+
+
+def migration(step):
+    """Register a migration step(conn); its version is its 1-based position in MIGRATIONS."""
+    MIGRATIONS.append(step)
+    return step
+
+
+@migration
+def _create_core_tables(conn):
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS books (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             title TEXT NOT NULL,
@@ -23,9 +602,7 @@ def init_db():
             borrower TEXT
         );
     """)
-
-    # Create members table
-    cur.execute("""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS members (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             name TEXT NOT NULL,
@@ -33,9 +610,7 @@ def init_db():
             contact_info TEXT
         );
     """)
-
-    # Create borrowed_books table
-    cur.execute("""
+    conn.execute("""
         CREATE TABLE IF NOT EXISTS borrowed_books (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             book_id INTEGER NOT NULL,
@@ -47,60 +622,295 @@ def init_db():
         );
     """)
 
-    conn.commit()
-    conn.close()
-
-def execute_query(query, params=(), fetch=False):
-    conn = sqlite3.connect(DB_NAME)
-    conn.row_factory = sqlite3.Row  # ✅ makes cursor results behave like dicts
-    conn.execute("PRAGMA foreign_keys = ON")
-    cur = conn.cursor()
-    cur.execute(query, params)
-    conn.commit()
-    if fetch:
+
+@migration
+def _add_lookup_indexes(conn):
+    # Indexes for the case-insensitive lookups in Library (the expressions must
+    # match the LOWER(...) used in the queries) and for closing open loans
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_title_lower ON books(LOWER(title));")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_members_name_lower ON members(LOWER(name));")
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_borrowed_books_book_member
+        ON borrowed_books(book_id, member_id, return_date);
+    """)
+
+
+@migration
+def _add_books_fts(conn):
+    # Full-text index over books, kept in sync by triggers (external content table)
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+            title, author, genre,
+            content='books', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts(rowid, title, author, genre) VALUES (new.id, new.title, new.author, new.genre);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, author, genre)
+            VALUES ('delete', old.id, old.title, old.author, old.genre);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author, genre ON books BEGIN
+            INSERT INTO books_fts(books_fts, rowid, title, author, genre)
+            VALUES ('delete', old.id, old.title, old.author, old.genre);
+            INSERT INTO books_fts(rowid, title, author, genre) VALUES (new.id, new.title, new.author, new.genre);
+        END;
+    """)
+    # Index books that were added before the search table existed
+    conn.execute("INSERT INTO books_fts(books_fts) VALUES ('rebuild');")
+
+
+@migration
+def _add_due_dates(conn):
+    # Existing open and past loans get the standard loan period
+    loan_columns = {row["name"] for row in conn.execute("PRAGMA table_info(borrowed_books)")}
+    if "due_date" not in loan_columns:
+        conn.execute("ALTER TABLE borrowed_books ADD COLUMN due_date TEXT;")
+        conn.execute("UPDATE borrowed_books SET due_date = datetime(borrow_date, ?) WHERE borrow_date IS NOT NULL;",
+                     (f"+{LOAN_PERIOD_DAYS} days",))
+    # Partial index over open loans only: open/overdue listings and counts walk
+    # the loans still out instead of the whole history
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_borrowed_books_open
+        ON borrowed_books(id, due_date) WHERE return_date IS NULL;
+    """)
+
+
+@migration
+def _split_titles_from_copies(conn):
+    # Titles: one row per (title, author) with copy counts. Each books row is a
+    # copy; triggers keep total/available counts in step with every insert,
+    # delete and availability change, inside the same transaction.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS titles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            author TEXT NOT NULL,
+            genre TEXT,
+            total_copies INTEGER NOT NULL DEFAULT 0,
+            available_copies INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_titles_key ON titles(LOWER(title), LOWER(author));")
+
+    book_columns = {row["name"] for row in conn.execute("PRAGMA table_info(books)")}
+    if "title_id" not in book_columns:
+        # Group existing copies into titles
+        conn.execute("ALTER TABLE books ADD COLUMN title_id INTEGER REFERENCES titles(id);")
+        conn.execute("INSERT OR IGNORE INTO titles (title, author, genre) SELECT title, author, genre FROM books ORDER BY id;")
+        conn.execute("""
+            UPDATE books SET title_id = (
+                SELECT t.id FROM titles t WHERE LOWER(t.title) = LOWER(books.title) AND LOWER(t.author) = LOWER(books.author)
+            );
+        """)
+        conn.execute("""
+            UPDATE titles SET
+                total_copies = (SELECT COUNT(*) FROM books WHERE title_id = titles.id),
+                available_copies = (SELECT COUNT(*) FROM books WHERE title_id = titles.id AND available != 0);
+        """)
+
+    # Free copies of a title: claiming one is a single index probe however many copies exist
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_books_free_copy ON books(title_id) WHERE available = 1;")
+    # A member's open loans, used to find the copy being returned
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_borrowed_books_open_member
+        ON borrowed_books(member_id) WHERE return_date IS NULL;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_title_insert AFTER INSERT ON books BEGIN
+            INSERT OR IGNORE INTO titles (title, author, genre) VALUES (new.title, new.author, new.genre);
+            UPDATE books SET title_id = (
+                SELECT id FROM titles WHERE LOWER(title) = LOWER(new.title) AND LOWER(author) = LOWER(new.author)
+            ) WHERE id = new.id;
+            UPDATE titles SET
+                total_copies = total_copies + 1,
+                available_copies = available_copies + (new.available != 0)
+            WHERE LOWER(title) = LOWER(new.title) AND LOWER(author) = LOWER(new.author);
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_title_delete AFTER DELETE ON books BEGIN
+            UPDATE titles SET
+                total_copies = total_copies - 1,
+                available_copies = available_copies - (old.available != 0)
+            WHERE id = old.title_id;
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS books_title_available AFTER UPDATE OF available ON books
+        WHEN (old.available != 0) != (new.available != 0) BEGIN
+            UPDATE titles SET available_copies = available_copies + (new.available != 0) - (old.available != 0)
+            WHERE id = new.title_id;
+        END;
+    """)
+
+
+@migration
+def _drop_titles_without_copies(conn):
+    # A title whose last copy is deleted goes with it, so lookups by title
+    # report it as not found instead of as fully borrowed
+    conn.execute("DROP TRIGGER IF EXISTS books_title_delete;")
+    conn.execute("""
+        CREATE TRIGGER books_title_delete AFTER DELETE ON books BEGIN
+            UPDATE titles SET
+                total_copies = total_copies - 1,
+                available_copies = available_copies - (old.available != 0)
+            WHERE id = old.title_id;
+            DELETE FROM titles WHERE id = old.title_id AND total_copies <= 0;
+        END;
+    """)
+    conn.execute("DELETE FROM titles WHERE total_copies <= 0;")
+
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn):
+    """The number of migration steps applied to the database (its PRAGMA user_version)."""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(target=None):
+    """Apply pending migrations up to target (default: all), in order.
+
+    Each step commits together with its user_version bump, so a failing step
+    leaves the database at the last good version. The version is re-read
+    inside every write transaction, so concurrent migrators never apply a
+    step twice.
+    """
+    target = SCHEMA_VERSION if target is None else target
+    while True:
+        with transaction() as conn:
+            version = schema_version(conn)
+            if version >= target:
+                return version
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+
+
+def init_db():
+    """Bring the database schema up to date.
+
+    The fast path is a single PRAGMA user_version read, and it happens once per
+    database file per process (forked workers inherit that it has). Only a
+    database that is behind takes the schema file lock and runs migrations.
+    A database newer than this code is left alone.
+    """
+    if DB_NAME in _schema_ready:
+        return
+    with connection() as conn:
+        current = schema_version(conn) >= SCHEMA_VERSION
+    if not current:
+        with _schema_lock():
+            migrate()
+    _schema_ready.add(DB_NAME)
+
+
+def execute_query(query, params=(), fetch=False, row_type=None):
+    """Run one statement on a pooled connection.
+
+    Outside a transaction() block the statement autocommits. Fetched rows are
+    dicts, or row_type.from_row(row) records when a record type is given.
+    """
+    with connection() as conn:
+        cur = conn.execute(query, params)
+        if fetch:
+            if row_type is not None:
+                return [row_type.from_row(row) for row in cur.fetchall()]
+            return [dict(row) for row in cur.fetchall()]  # convert sqlite Row → dict
+
+
+def iter_query(query, params=(), batch_size=500, row_type=None):
+    """Yield rows as dicts (or row_type records), pulling batch_size rows at a time with fetchmany.
+
+    Only one batch is held in memory, so this is safe for whole-table reads.
+    A pooled connection of its own is held until the generator is exhausted or
+    closed. It is never published as the thread's held connection, because a
+    streamed response may be resumed and closed on different threads.
+    """
+    pool = get_pool()
+    conn = pool.acquire()
+    try:
+        cur = conn.execute(query, params)
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row_type.from_row(row) if row_type is not None else dict(row)
+    finally:
+        pool.release(conn)
+
+
+FRAME_BACKENDS = ("pandas", "arrow")
+
+
+def fetch_frame(query, params=(), backend="pandas"):
+    """Run a SELECT straight into a pandas DataFrame or a pyarrow Table.
+
+    Rows are fetched as plain tuples and handed to the columnar library in one
+    go, skipping the per-row dict construction of execute_query. pandas and
+    pyarrow are imported on first use.
+    """
+    if backend not in FRAME_BACKENDS:
+        raise ValueError(f"Unknown frame backend '{backend}', expected one of {FRAME_BACKENDS}")
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None  # plain tuples
+        cur.execute(query, params)
+        names = [d[0] for d in cur.description]
         rows = cur.fetchall()
-        data = [dict(row) for row in rows]  # convert sqlite Row → dict
-        conn.close()
-        return data
-    conn.close()
+
+    if backend == "pandas":
+        import pandas as pd
+        return pd.DataFrame.from_records(rows, columns=names)
+
+    import pyarrow as pa
+    columns = zip(*rows) if rows else [()] * len(names)
+    return pa.table({name: pa.array(column) for name, column in zip(names, columns)})
 
 
 def seed_data():
     """Insert sample books and members if tables are empty."""
-    conn = sqlite3.connect(DB_NAME)
-    cur = conn.cursor()
-
-    # --- Check if already seeded ---
-    cur.execute("SELECT COUNT(*) FROM books;")
-    book_count = cur.fetchone()[0]
-    cur.execute("SELECT COUNT(*) FROM members;")
-    member_count = cur.fetchone()[0]
-
-    # --- Seed books ---
-    if book_count == 0:
-        sample_books = [
-            ("The Alchemist", "Paulo Coelho", "Fiction"),
-            ("Atomic Habits", "James Clear", "Self-Help"),
-            ("To Kill a Mockingbird", "Harper Lee", "Classic")
-        ]
-        cur.executemany(
-            "INSERT INTO books (title, author, genre, available) VALUES (?, ?, ?, 1);",
-            sample_books
-        )
-        print("📚 Sample books added.")
-
-    # --- Seed members ---
-    if member_count == 0:
-        sample_members = [
-            ("Arun", 25, "arun@email.com"),
-            ("Priya", 30, "priya@email.com")
-        ]
-        cur.executemany(
-            "INSERT INTO members (name, age, contact_info) VALUES (?, ?, ?);",
-            sample_members
-        )
-        print("👥 Sample members added.")
-
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        cur = conn.cursor()
+
+        # --- Check if already seeded ---
+        cur.execute("SELECT COUNT(*) FROM books;")
+        book_count = cur.fetchone()[0]
+        cur.execute("SELECT COUNT(*) FROM members;")
+        member_count = cur.fetchone()[0]
+
+        # --- Seed books ---
+        if book_count == 0:
+            sample_books = [
+                ("The Alchemist", "Paulo Coelho", "Fiction"),
+                ("Atomic Habits", "James Clear", "Self-Help"),
+                ("To Kill a Mockingbird", "Harper Lee", "Classic")
+            ]
+            cur.executemany(
+                "INSERT INTO books (title, author, genre, available) VALUES (?, ?, ?, 1);",
+                sample_books
+            )
+            print("📚 Sample books added.")
+
+        # --- Seed members ---
+        if member_count == 0:
+            sample_members = [
+                ("Arun", 25, "arun@email.com"),
+                ("Priya", 30, "priya@email.com")
+            ]
+            cur.executemany(
+                "INSERT INTO members (name, age, contact_info) VALUES (?, ?, ?);",
+                sample_members
+            )
+            print("👥 Sample members added.")
+
     print("✅ Seeding completed successfully!")
@@ -0,0 +1,39 @@
+# library_import.py
+"""Command-line bulk import of books or members from CSV or JSON Lines."""
+import argparse
+import json
+import sys
+from library_core_oops import Library, IMPORT_FORMATS, DEFAULT_IMPORT_BATCH_SIZE
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import books or members into the library database.")
+    parser.add_argument("kind", choices=["books", "members"])
+    parser.add_argument("path", help="CSV or JSON Lines file, or '-' for stdin")
+    parser.add_argument("--format", choices=IMPORT_FORMATS,
+                        help="input format (default: guessed from the file extension, else csv)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_IMPORT_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ("jsonl" if args.path.endswith((".jsonl", ".ndjson")) else "csv")
+    library = Library()
+    importer = library.import_books if args.kind == "books" else library.import_members
+
+    try:
+        if args.path == "-":
+            report = importer(sys.stdin, fmt, args.batch_size)
+        else:
+            with open(args.path, encoding="utf-8-sig", newline="") as stream:
+                report = importer(stream, fmt, args.batch_size)
+    except ValueError as e:
+        print(f"❌ Import failed: {e}.", file=sys.stderr)
+        return 2
+
+    print(f"✅ Imported {report['inserted']} {args.kind}, {report['failed']} row(s) rejected.")
+    for error in report["errors"]:
+        print(json.dumps(error))
+    return 0 if not report["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+# library_records.py
+"""Compact record types for books, members and loans.
+
+Records keep their fields in __slots__ (no per-instance __dict__), which makes
+them several times smaller than the dicts they replace, while still reading
+like those dicts: record["title"], record.get("genre"), dict(record) and ==
+against a plain dict all work. Use to_frame(records) rather than
+pd.DataFrame(records), which sorts the columns of non-dict mappings.
+"""
+from array import array
+from collections.abc import Mapping
+
+
+class Record(Mapping):
+    """Base for fixed-field records; subclasses list their fields in _fields."""
+    __slots__ = ()
+    _fields = ()
+
+    def __init__(self, *values, **fields):
+        for name, value in zip(self._fields, values):
+            setattr(self, name, value)
+        for name, value in fields.items():
+            self[name] = value
+
+    @classmethod
+    def from_row(cls, row):
+        """Build a record from a sqlite3.Row / tuple whose columns follow _fields."""
+        return cls(*row)
+
+    def __getitem__(self, key):
+        if key not in self._fields:
+            raise KeyError(key)
+        return getattr(self, key, None)
+
+    def __setitem__(self, key, value):
+        if key not in self._fields:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def _asdict(self):
+        return {name: getattr(self, name, None) for name in self._fields}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self._asdict()!r})"
+
+
+class BookRecord(Record):
+    __slots__ = _fields = ("id", "title", "author", "genre", "available", "borrower")
+
+
+class TitleRecord(Record):
+    """A title (title + author) with counts over its physical copies in books."""
+    __slots__ = _fields = ("id", "title", "author", "genre", "total_copies", "available_copies")
+
+
+class MemberRecord(Record):
+    __slots__ = _fields = ("id", "name", "age", "contact_info")
+
+
+class BorrowerRecord(MemberRecord):
+    """Member of the in-memory store, which also tracks the titles it holds."""
+    __slots__ = ("borrowed_books",)
+    _fields = MemberRecord._fields + __slots__
+
+
+class LoanRecord(Record):
+    __slots__ = _fields = ("id", "book_id", "member_id", "borrow_date", "due_date", "return_date")
+
+
+class LoanDetailRecord(LoanRecord):
+    """Loan joined with the borrowed book's title and the member's name."""
+    __slots__ = ("book_title", "member_name")
+    _fields = LoanRecord._fields + __slots__
+
+
+# Typecodes for columns stored as compact arrays; other columns stay lists.
+BOOK_COLUMN_TYPES = {"id": "q", "available": "b"}
+
+
+def to_columns(records, fields, column_types=BOOK_COLUMN_TYPES):
+    """Turn records (or sqlite3.Row objects) into parallel columns.
+
+    Integer columns listed in column_types become array.array, the rest lists.
+    """
+    columns = {name: array(column_types[name]) if name in column_types else [] for name in fields}
+    appenders = [columns[name].append for name in fields]
+    for record in records:
+        for append, name in zip(appenders, fields):
+            append(record[name])
+    return columns
+
+
+def to_frame(records):
+    """Records as a pandas DataFrame whose columns follow the records' field order.
+
+    pandas is imported on first use.
+    """
+    import pandas as pd
+    records = list(records)
+    fields = list(getattr(records[0], "_fields", None) or records[0]) if records else []
+    return pd.DataFrame(to_columns(records, fields, {}), columns=fields)
@@ -0,0 +1,133 @@
+# library_server.py
+"""Prefork launcher for the Library API.
+
+The master process creates the schema once (under library_db's file lock),
+opens the listening socket and forks N workers. Every worker imports
+library_api after the fork, so its Library, connection pool and write-behind
+thread belong to that worker alone, and serves the shared socket with
+Werkzeug's threaded WSGI server. The kernel spreads new connections across
+the workers. The master restarts workers that die, and SIGTERM / SIGINT stop
+them all.
+
+    python library_server.py --workers 4 --port 5000
+
+Metrics (/metrics, /stats/latency) and read caches are per worker. A cached
+read is dropped once any process commits to the database (Library checks
+PRAGMA data_version), so a write on one worker is seen by the others' next
+read. On platforms without fork() the API is served by a single process.
+"""
+import argparse
+import os
+import signal
+import socket
+import sys
+import time
+import library_db
+
+DEFAULT_WORKERS = int(os.environ.get("LIBRARY_WORKERS", os.cpu_count() or 1))
+RESTART_DELAY = 1.0  # seconds between restarts of a worker that keeps dying
+
+
+def _serve(sock):
+    """Worker body: build the app in this process and serve the inherited socket."""
+    from werkzeug.serving import make_server
+    import library_api
+
+    host, port = sock.getsockname()[:2]
+    server = make_server(host, port, library_api.app, threaded=True, fd=sock.fileno())
+    signal.signal(signal.SIGTERM, _interrupt)  # serve_forever() stops cleanly on KeyboardInterrupt
+    try:
+        server.serve_forever()
+    finally:
+        library_api.library.close()
+        library_db.close_pool()
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _spawn(sock):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            signal.signal(signal.SIGINT, signal.SIG_IGN)  # the master turns Ctrl+C into SIGTERM
+            _serve(sock)
+        except BaseException:
+            code = 1
+            import traceback
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+    return pid
+
+
+def run(host="127.0.0.1", port=5000, workers=DEFAULT_WORKERS):
+    library_db.init_db()
+    library_db.close_pool()  # workers open their own connections
+
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(128)
+    sock.set_inheritable(True)
+    print(f"✅ Serving on http://{host}:{sock.getsockname()[1]} with {workers} worker(s)", flush=True)
+
+    if not hasattr(os, "fork"):
+        _serve(sock)
+        return 0
+
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    children = {_spawn(sock) for _ in range(workers)}
+    while children:
+        if stopping:
+            for pid in children:
+                _kill(pid)
+            for pid in list(children):
+                os.waitpid(pid, 0)
+                children.discard(pid)
+            break
+        try:
+            pid, _ = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid == 0:
+            time.sleep(0.1)
+            continue
+        children.discard(pid)
+        if not stopping:
+            print(f"⚠️ Worker {pid} exited, restarting it.", file=sys.stderr, flush=True)
+            time.sleep(RESTART_DELAY)
+            children.add(_spawn(sock))
+    sock.close()
+    return 0
+
+
+def _kill(pid):
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except ProcessLookupError:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the Library API with several worker processes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000, help="0 picks a free port")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help="worker processes (default: LIBRARY_WORKERS or the CPU count)")
+    args = parser.parse_args(argv)
+    return run(args.host, args.port, max(1, args.workers))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
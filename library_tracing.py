@@ -0,0 +1,193 @@
+# library_tracing.py
+"""Per-request latency tracing for the Flask API.
+
+RequestTracer hooks into a Flask app and, for every request:
+
+- attaches a request id (the caller's X-Request-ID if it looks sane, else a
+  new one) and echoes it in the response;
+- splits the request's wall time into SQLite (library_db.sql_seconds), the
+  rest of the Library methods (through TracedLibrary) and Flask itself, and
+  reports the split in a Server-Timing header;
+- records per-route latency histograms in the metrics registry (/metrics)
+  and a rolling window of samples for p50/p95/p99 (/stats/latency);
+- with profile_every=N, runs cProfile on one request in N and dumps the
+  stats to profile_dir (load them with pstats or snakeviz).
+
+Time spent on the write-behind writer thread is not seen by the request
+thread, so it shows up as Library time, not SQLite time.
+"""
+import cProfile
+import functools
+import itertools
+import os
+import re
+import threading
+import time
+import uuid
+from collections import deque
+from flask import g, jsonify, request
+import library_db
+from library_metrics import REGISTRY
+
+TRACE_WINDOW_SECONDS = float(os.environ.get("LIBRARY_TRACE_WINDOW", 300))
+TRACE_MAX_SAMPLES = 10000  # per route, within the window
+PROFILE_EVERY = int(os.environ.get("LIBRARY_PROFILE_EVERY", 0))  # 0 disables profiling
+PROFILE_DIR = os.environ.get("LIBRARY_PROFILE_DIR", "profiles")
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "library_http_request_seconds", "HTTP request latency by route.", ["method", "route", "status"])
+PHASE_SECONDS = REGISTRY.histogram(
+    "library_http_phase_seconds", "HTTP request time by route, split into flask / library / sqlite.",
+    ["route", "phase"])
+
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+_local = threading.local()
+
+
+def library_seconds():
+    """Total seconds this thread has spent inside TracedLibrary method calls."""
+    return getattr(_local, "library_seconds", 0.0)
+
+
+class TracedLibrary:
+    """Proxy that times every public method call of a Library for the request breakdown."""
+
+    def __init__(self, library):
+        self._library = library
+
+    def __getattr__(self, name):
+        attr = getattr(self._library, name)
+        if name.startswith("_") or not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        def traced(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                _local.library_seconds = library_seconds() + time.perf_counter() - start
+        return traced
+
+
+class RollingWindow:
+    """Latency samples of the last `seconds` (at most max_samples) for percentile reports."""
+
+    def __init__(self, seconds=TRACE_WINDOW_SECONDS, max_samples=TRACE_MAX_SAMPLES):
+        self.seconds = seconds
+        self._samples = deque(maxlen=max_samples)  # (monotonic time, total, flask, library, sqlite)
+        self._lock = threading.Lock()
+
+    def add(self, total, flask, library, sqlite):
+        with self._lock:
+            self._samples.append((time.monotonic(), total, flask, library, sqlite))
+
+    def summary(self):
+        cutoff = time.monotonic() - self.seconds
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            samples = list(self._samples)
+        if not samples:
+            return None
+        totals = sorted(s[1] for s in samples)
+        n = len(samples)
+        return {
+            "count": n,
+            "p50_ms": _ms(_percentile(totals, 50)),
+            "p95_ms": _ms(_percentile(totals, 95)),
+            "p99_ms": _ms(_percentile(totals, 99)),
+            "mean_flask_ms": _ms(sum(s[2] for s in samples) / n),
+            "mean_library_ms": _ms(sum(s[3] for s in samples) / n),
+            "mean_sqlite_ms": _ms(sum(s[4] for s in samples) / n),
+        }
+
+
+class RequestTracer:
+    def __init__(self, app, window_seconds=TRACE_WINDOW_SECONDS, profile_every=PROFILE_EVERY,
+                 profile_dir=PROFILE_DIR):
+        self.window_seconds = window_seconds
+        self.profile_every = profile_every
+        self.profile_dir = profile_dir
+        self.windows = {}
+        self._windows_lock = threading.Lock()
+        self._requests = itertools.count(1)
+        # cProfile cannot run two profilers at once, so sampled requests take turns
+        self._profiler_lock = threading.Lock()
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        app.add_url_rule("/stats/latency", "latency_stats", self.latency_stats)
+
+    def _before(self):
+        incoming = request.headers.get("X-Request-ID", "")
+        g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+        g.trace_start = time.perf_counter()
+        g.trace_sql = library_db.sql_seconds()
+        g.trace_library = library_seconds()
+        g.profiler = None
+        if self.profile_every and next(self._requests) % self.profile_every == 0 \
+                and self._profiler_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def _after(self, response):
+        total = time.perf_counter() - g.trace_start
+        sqlite = library_db.sql_seconds() - g.trace_sql
+        library = max(0.0, library_seconds() - g.trace_library - sqlite)
+        flask = max(0.0, total - library - sqlite)
+        route = request.url_rule.rule if request.url_rule else "<unmatched>"
+
+        REQUEST_SECONDS.observe(total, method=request.method, route=route, status=response.status_code)
+        for phase, seconds in (("flask", flask), ("library", library), ("sqlite", sqlite)):
+            PHASE_SECONDS.observe(seconds, route=route, phase=phase)
+        self._window(f"{request.method} {route}").add(total, flask, library, sqlite)
+
+        response.headers["X-Request-ID"] = g.request_id
+        response.headers["Server-Timing"] = (
+            f"flask;dur={_ms(flask)}, library;dur={_ms(library)}, sqlite;dur={_ms(sqlite)}, total;dur={_ms(total)}")
+        return response
+
+    def _teardown(self, exc):
+        profiler = g.pop("profiler", None)
+        if profiler is None:
+            return
+        try:
+            profiler.disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            route = re.sub(r"[^A-Za-z0-9]+", "_", request.path).strip("_") or "root"
+            name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.method}-{route}-{g.request_id}.prof"
+            profiler.dump_stats(os.path.join(self.profile_dir, name))
+        finally:
+            self._profiler_lock.release()
+
+    def _window(self, key):
+        with self._windows_lock:
+            window = self.windows.get(key)
+            if window is None:
+                window = self.windows[key] = RollingWindow(self.window_seconds)
+            return window
+
+    def latency_stats(self):
+        """
+        Request Latency Percentiles
+        ---
+        responses:
+          200:
+            description: p50/p95/p99 and mean flask / library / sqlite time per route over the rolling window
+        """
+        with self._windows_lock:
+            windows = dict(self.windows)
+        stats = {key: window.summary() for key, window in sorted(windows.items())}
+        return jsonify({"window_seconds": self.window_seconds,
+                        "routes": {key: summary for key, summary in stats.items() if summary}}), 200
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
@@ -1,12 +1,26 @@
+import io
+import sqlite3
+import time
+from datetime import datetime, timedelta, timezone
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
+import library_db
 from library_core_oops import Library, Book, Member
+from library_records import to_frame
 
 # ---------------------------
 # FIXTURES
 # ---------------------------
 @pytest.fixture
-def mock_db():
+def temp_db(tmp_path):
+    """Point library_db at a throwaway database file."""
+    with patch("library_db.DB_NAME", str(tmp_path / "library.db")):
+        yield library_db.DB_NAME
+        library_db.close_pool()
+
+@pytest.fixture
+def mock_db(temp_db):
     """Mock execute_query and init_db for all tests."""
     with patch("library_core_oops.execute_query") as mock_exec, \
          patch("library_core_oops.init_db") as mock_init:
@@ -16,6 +30,13 @@ def mock_db():
 def library(mock_db):
     return Library()
 
+@pytest.fixture
+def db_library(temp_db):
+    """A Library backed by a real, seeded temp database."""
+    library = Library()
+    library_db.seed_data()
+    return library
+
 # ---------------------------
 # TEST: ADD BOOK
 # ---------------------------
@@ -44,105 +65,249 @@ def test_register_member(library, mock_db):
 # ---------------------------
 # TEST: BORROW BOOK – SUCCESS
 # ---------------------------
-def test_borrow_book_success(library, mock_db):
-    mock_db(
-        # book exists and available
-        [{"id": 1, "available": 1}],
-        # member exists
-        [{"id": 10}],
-        # UPDATE book (no return value)
-        None,
-        # INSERT into borrowed_books (no return value)
-        None
-    )
-
-    result = library.borrow_book("The Alchemist", "Arun")
+def test_borrow_book_success(db_library):
+    result = db_library.borrow_book("The Alchemist", "Arun")
     assert "borrowed by" in result
 
+    book = library_db.execute_query("SELECT available, borrower FROM books WHERE title='The Alchemist'", fetch=True)
+    assert book == [{"available": 0, "borrower": "Arun"}]
+    loans = library_db.execute_query("SELECT book_id, member_id, return_date FROM borrowed_books", fetch=True)
+    assert loans == [{"book_id": 1, "member_id": 1, "return_date": None}]
+
 # ---------------------------
 # TEST: BORROW BOOK – BOOK NOT FOUND
 # ---------------------------
-def test_borrow_book_not_found(library, mock_db):
-    mock_db.side_effect = [
-        [],  # 1st call: book query → not found
-        [{"id": 1}]  # 2nd call: member query (won’t be used but required)
-    ]
-
-    result = library.borrow_book("Unknown Book", "Arun")
+def test_borrow_book_not_found(db_library):
+    result = db_library.borrow_book("Unknown Book", "Arun")
     assert "not found" in result
 
 
 # ---------------------------
 # TEST: BORROW BOOK – MEMBER NOT FOUND
 # ---------------------------
-def test_borrow_book_member_not_found(library, mock_db):
-    mock_db.side_effect = [
-        [{"id": 1, "available": 1}],  # book exists
-        [],  # member missing
-    ]
-
-    result = library.borrow_book("The Alchemist", "Unknown")
+def test_borrow_book_member_not_found(db_library):
+    result = db_library.borrow_book("The Alchemist", "Unknown")
     assert "not found" in result
+    assert library_db.execute_query("SELECT * FROM borrowed_books", fetch=True) == []
 
 
 # ---------------------------
 # TEST: BORROW BOOK – ALREADY BORROWED
 # ---------------------------
-def test_borrow_book_already_borrowed(library, mock_db):
-    mock_db.side_effect = [
-        [(1, 0)],  # book exists but already borrowed
-        [(10,)],  # member exists
-    ]
+def test_borrow_book_already_borrowed(db_library):
+    db_library.borrow_book("The Alchemist", "Priya")
 
-    result = library.borrow_book("The Alchemist", "Arun")
+    result = db_library.borrow_book("The Alchemist", "Arun")
     assert "already borrowed" in result
+    assert len(library_db.execute_query("SELECT * FROM borrowed_books", fetch=True)) == 1
+
+
+def test_concurrent_borrows_claim_book_once(db_library):
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda name: db_library.borrow_book("The Alchemist", name), ["Arun", "Priya"] * 4))
+
+    assert sum("borrowed by" in r for r in results) == 1
+    assert len(library_db.execute_query("SELECT * FROM borrowed_books", fetch=True)) == 1
+
+
+def test_borrow_book_rolls_back_when_loan_insert_fails(db_library):
+    with patch("library_core_oops.datetime") as mock_dt:
+        mock_dt.now.side_effect = RuntimeError("clock failure")
+        with pytest.raises(RuntimeError):
+            db_library.borrow_book("The Alchemist", "Arun")
+
+    book = library_db.execute_query("SELECT available FROM books WHERE title='The Alchemist'", fetch=True)
+    assert book == [{"available": 1}]
 
 
 # ---------------------------
 # TEST: RETURN BOOK SUCCESS
 # ---------------------------
-def test_return_book_success(library, mock_db):
-    mock_db.side_effect = [
-        [{"id": 1}],        # book exists
-        [{"id": 10}],       # member exists
-        None,
-        None
-    ]
+def test_return_book_success(db_library):
+    db_library.borrow_book("The Alchemist", "Arun")
 
-    result = library.return_book("The Alchemist", "Arun")
+    result = db_library.return_book("The Alchemist", "Arun")
     assert "returned" in result
 
+    book = library_db.execute_query("SELECT available, borrower FROM books WHERE title='The Alchemist'", fetch=True)
+    assert book == [{"available": 1, "borrower": None}]
+    loan = library_db.execute_query("SELECT return_date FROM borrowed_books", fetch=True)
+    assert loan[0]["return_date"] is not None
+
 
 # ---------------------------
 # TEST: RETURN BOOK - NOT FOUND
 # ---------------------------
-def test_return_book_not_found(library, mock_db):
-    mock_db.side_effect = [
-        [],   # book missing
-        [],   # member missing
-    ]
-
-    result = library.return_book("Unknown", "Unknown")
+def test_return_book_not_found(db_library):
+    result = db_library.return_book("Unknown", "Unknown")
     assert "not found" in result
 
 
+def test_return_book_by_other_member_keeps_book_borrowed(db_library):
+    db_library.borrow_book("The Alchemist", "Arun")
+
+    result = db_library.return_book("The Alchemist", "Priya")
+    assert "not borrowed by" in result
+
+    book = library_db.execute_query("SELECT available FROM books WHERE title='The Alchemist'", fetch=True)
+    assert book == [{"available": 0}]
+
+
+# ---------------------------
+# TEST: BORROW / RETURN BY ID
+# ---------------------------
+def test_borrow_and_return_by_id(db_library):
+    assert "borrowed by member #1" in db_library.borrow_by_id(2, 1)
+    assert "already borrowed" in db_library.borrow_by_id(2, 2)
+
+    book = library_db.execute_query("SELECT available, borrower FROM books WHERE id=2", fetch=True)
+    assert book == [{"available": 0, "borrower": "Arun"}]
+
+    assert "not borrowed by member #2" in db_library.return_by_id(2, 2)
+    assert "returned by member #1" in db_library.return_by_id(2, 1)
+    assert library_db.execute_query("SELECT available FROM books WHERE id=2", fetch=True) == [{"available": 1}]
+
+
+def test_borrow_by_id_unknown_book_or_member(db_library):
+    assert "Book #99 not found" in db_library.borrow_by_id(99, 1)
+    assert "Member #99 not found" in db_library.borrow_by_id(1, 99)
+    assert "Book #99 not found" in db_library.return_by_id(99, 1)
+    assert library_db.execute_query("SELECT * FROM borrowed_books", fetch=True) == []
+
+
+def test_resolve_titles_and_members_list_every_match(db_library):
+    db_library.add_book("The Alchemist", "Paulo Coelho", "Fiction")
+    db_library.borrow_by_id(1, 1)
+    db_library.register_member("arun", 30, "")
+
+    assert db_library.resolve_titles(["the alchemist", "Nope"]) == {"the alchemist": [4, 1], "Nope": []}
+    assert db_library.resolve_members(["Arun", "Priya"]) == {"Arun": [1, 3], "Priya": [2]}
+
+
+# ---------------------------
+# TEST: BATCH BORROW / RETURN
+# ---------------------------
+def test_borrow_many_reports_each_title(db_library):
+    db_library.add_book("The Alchemist", "Paulo Coelho", "Fiction")
+    db_library.borrow_book("Atomic Habits", "Priya")
+
+    results = db_library.borrow_many(["the alchemist", "The Alchemist", "The Alchemist", "Atomic Habits", "Nope"],
+                                     "Arun")
+    messages = [r["message"] for r in results]
+    assert ["borrowed by" in m for m in messages] == [True, True, False, False, False]
+    assert "already borrowed" in messages[2] and "not found" in messages[4]
+
+    loans = library_db.execute_query("SELECT book_id FROM borrowed_books WHERE member_id=1 ORDER BY book_id",
+                                     fetch=True)
+    assert [l["book_id"] for l in loans] == [1, 4]
+    alchemist = _copy_counts()[0]
+    assert (alchemist["total_copies"], alchemist["available_copies"]) == (2, 0)
+
+
+def test_borrow_many_unknown_member_changes_nothing(db_library):
+    results = db_library.borrow_many(["The Alchemist"], "Nobody")
+    assert "Member 'Nobody' not found" in results[0]["message"]
+    assert library_db.execute_query("SELECT * FROM borrowed_books", fetch=True) == []
+
+
+def test_return_many_closes_member_loans(db_library):
+    db_library.borrow_many(["The Alchemist", "Atomic Habits"], "Arun")
+
+    results = db_library.return_many(["Atomic Habits", "To Kill a Mockingbird", "Nope", "The Alchemist"], "Arun")
+    messages = [r["message"] for r in results]
+    assert "returned by" in messages[0] and "returned by" in messages[3]
+    assert "not borrowed by" in messages[1] and "not found" in messages[2]
+    assert library_db.execute_query("SELECT COUNT(*) AS n FROM books WHERE available=0", fetch=True) == [{"n": 0}]
+
+
+def test_borrow_many_uses_fixed_number_of_queries(db_library):
+    statements = []
+    with library_db.connection() as conn:
+        conn.set_trace_callback(statements.append)
+        db_library.borrow_many(["The Alchemist", "Atomic Habits", "To Kill a Mockingbird"], "Arun")
+        conn.set_trace_callback(None)
+    selects = [s for s in statements if s.lstrip().upper().startswith(("SELECT", "WITH"))]
+    assert len(selects) == 3  # member, titles and free copies, however many titles
+
+
+def test_borrow_many_rejects_oversized_batch(db_library):
+    with pytest.raises(ValueError):
+        db_library.borrow_many(["The Alchemist"] * 101, "Arun")
+
+
 # ---------------------------
 # TEST: VIEW REPORTS
 # ---------------------------
 def test_view_reports(library, mock_db):
-    mock_db.side_effect = [
-        [{"count": 10}],  # total books
-        [{"count": 3}],   # borrowed
-        [{"count": 5}],   # total members
+    mock_db.return_value = [
+        {"total_books": 10, "borrowed": 3, "total_members": 5, "active_loans": 3, "overdue_loans": 1}
     ]
 
     result = library.view_reports()
+    assert mock_db.call_count == 1  # every counter comes from one aggregate query
     assert result["Total Books"] == 10
     assert result["Borrowed"] == 3
     assert result["Available"] == 7
     assert result["Total Members"] == 5
 
 
+def test_view_reports_extended(db_library):
+    db_library.borrow_book("The Alchemist", "Arun")
+    library_db.execute_query("UPDATE borrowed_books SET due_date='2000-01-15 00:00:00'")
+    db_library.borrow_book("Atomic Habits", "Priya")
+
+    result = db_library.view_reports(extended=True)
+    assert result["Active Loans"] == 2
+    assert result["Overdue Loans"] == 1
+    assert result["By Genre"] == {"Classic": 1, "Fiction": 1, "Self-Help": 1}
+
+
+def test_view_reports_cached_until_write(db_library):
+    assert db_library.view_reports() is db_library.view_reports()
+
+    db_library.add_book("Dune", "Frank Herbert", "Sci-Fi")
+    assert db_library.view_reports()["Total Books"] == 4
+
+
+def test_cache_sees_commits_made_outside_the_library(db_library):
+    assert db_library.view_reports()["Borrowed"] == 0
+
+    library_db.execute_query("UPDATE books SET available=0")  # another connection, like another worker
+    assert db_library.view_reports()["Borrowed"] == 3
+    Library().add_book("Dune", "Frank Herbert", "Sci-Fi")
+    assert db_library.view_reports()["Total Books"] == 4
+
+
+# ---------------------------
+# TEST: READ CACHE
+# ---------------------------
+def test_reads_are_cached_until_a_write(library, mock_db):
+    mock_db.return_value = [{"id": 1, "name": "Arun", "age": 25, "contact_info": ""}]
+
+    assert library.view_members() is library.view_members()
+    assert mock_db.call_count == 1
+
+    library.register_member("Priya", 30, "")
+    library.view_members()
+    assert mock_db.call_count == 3  # INSERT, then a fresh SELECT
+
+
+def test_cache_entries_expire_after_ttl(library, mock_db):
+    mock_db.return_value = []
+    library.view_books()
+    with patch("library_core_oops.time.monotonic", return_value=time.monotonic() + 60):
+        library.view_books()
+    assert mock_db.call_count == 2
+
+
+def test_cache_keys_include_arguments(library, mock_db):
+    mock_db.return_value = []
+    library.view_books(after_id=1, limit=10)
+    library.view_books(after_id=11, limit=10)
+    library.view_books(after_id=1, limit=10)
+    assert mock_db.call_count == 2
+
+
 # ---------------------------
 # TEST: VIEW BOOKS
 # ---------------------------
@@ -168,25 +333,610 @@ def test_view_members(library, mock_db):
     assert members[0]["name"] == "Arun"
 
 
+def test_view_books_keyset_pages(db_library):
+    first = db_library.view_books(limit=2)
+    second = db_library.view_books(after_id=first[-1]["id"], limit=2)
+
+    assert [b["id"] for b in first] == [1, 2]
+    assert [b["id"] for b in second] == [3]
+    assert db_library.view_books(after_id=3, limit=2) == []
+
+
+def test_view_members_keyset_pages(db_library):
+    assert [m["name"] for m in db_library.view_members(limit=1)] == ["Arun"]
+    assert [m["name"] for m in db_library.view_members(after_id=1, limit=1)] == ["Priya"]
+
+
+def test_view_books_returns_slotted_records(db_library):
+    book = db_library.view_books(limit=1)[0]
+    assert not hasattr(book, "__dict__")
+    assert dict(book) == {"id": 1, "title": "The Alchemist", "author": "Paulo Coelho", "genre": "Fiction",
+                          "available": True, "borrower": None}
+
+
+def test_records_frame_keeps_field_order(db_library):
+    pytest.importorskip("pandas")
+    frame = to_frame(db_library.view_books())
+    assert list(frame.columns) == ["id", "title", "author", "genre", "available", "borrower"]
+    assert list(frame["title"]) == ["The Alchemist", "Atomic Habits", "To Kill a Mockingbird"]
+    assert to_frame([]).empty
+
+
+def test_book_columns(db_library):
+    db_library.borrow_book("Atomic Habits", "Arun")
+
+    columns = db_library.book_columns()
+    assert columns["id"].typecode == "q"
+    assert list(columns["id"]) == [1, 2, 3]
+    assert list(columns["available"]) == [1, 0, 1]
+    assert columns["borrower"] == [None, "Arun", None]
+
+
+def test_books_frame_pandas_and_arrow(db_library):
+    pytest.importorskip("pandas")
+    pytest.importorskip("pyarrow")
+    db_library.borrow_book("Atomic Habits", "Arun")
+
+    df = db_library.books_frame()
+    assert list(df.columns) == ["id", "title", "author", "genre", "available", "borrower"]
+    assert df["available"].tolist() == [True, False, True]
+
+    table = db_library.books_frame(backend="arrow")
+    assert table.num_rows == 3
+    assert table.column("available").to_pylist() == [True, False, True]
+
+
+def test_loans_and_genre_frames(db_library):
+    pytest.importorskip("pandas")
+    db_library.borrow_book("The Alchemist", "Priya")
+
+    loans = db_library.loans_frame()
+    assert loans[["book_title", "member_name"]].values.tolist() == [["The Alchemist", "Priya"]]
+    assert loans["return_date"].isna().all()
+
+    genres = db_library.genre_counts()
+    assert dict(zip(genres["genre"], genres["count"])) == {"Classic": 1, "Fiction": 1, "Self-Help": 1}
+
+
+def test_frames_on_empty_tables(temp_db):
+    pytest.importorskip("pyarrow")
+    library = Library()
+    assert library.members_frame().empty
+    assert library.books_frame(backend="arrow").num_rows == 0
+    with pytest.raises(ValueError):
+        library.books_frame(backend="polars")
+
+
 # ---------------------------
 # TEST: DELETE BOOK - SUCCESS
 # ---------------------------
-def test_delete_book_success(library, mock_db):
-    mock_db.side_effect = [
-        [{"id": 1, "title": "Test Book", "available": 1}],  # book exists
-        None,  # delete borrowed_books
-        None   # delete book
-    ]
+def test_delete_book_success(db_library):
+    db_library.borrow_book("The Alchemist", "Arun")
 
-    result = library.delete_book(1)
+    result = db_library.delete_book(1)
     assert "deleted successfully" in result
+    assert library_db.execute_query("SELECT * FROM books WHERE id=1", fetch=True) == []
+    assert library_db.execute_query("SELECT * FROM borrowed_books", fetch=True) == []
 
 
 # ---------------------------
 # TEST: DELETE BOOK - NOT FOUND
 # ---------------------------
-def test_delete_book_not_found(library, mock_db):
-    mock_db.return_value = []  # no book
+def test_delete_book_not_found(db_library):
+    result = db_library.delete_book(100)
+    assert "not found" in result
+
+
+# ---------------------------
+# TEST: LOOKUP INDEXES
+# ---------------------------
+@pytest.mark.parametrize("query, index", [
+    ("SELECT id, available FROM books WHERE LOWER(title)=LOWER(?)", "idx_books_title_lower"),
+    ("SELECT id FROM members WHERE LOWER(name)=LOWER(?)", "idx_members_name_lower"),
+    ("UPDATE borrowed_books SET return_date='x' WHERE book_id=? AND member_id=? AND return_date IS NULL",
+     "idx_borrowed_books_book_member"),
+])
+def test_lookups_use_indexes(db_library, query, index):
+    params = (1, 1) if "book_id" in query else ("the alchemist",)
+    plan = library_db.execute_query(f"EXPLAIN QUERY PLAN {query}", params, fetch=True)
+    assert any(index in row["detail"] for row in plan)
+
+
+# ---------------------------
+# TEST: MULTI-COPY INVENTORY
+# ---------------------------
+def _copy_counts():
+    return library_db.execute_query(
+        """
+        SELECT t.title, t.total_copies, t.available_copies,
+               (SELECT COUNT(*) FROM books b WHERE b.title_id = t.id) AS actual_total,
+               (SELECT COUNT(*) FROM books b WHERE b.title_id = t.id AND b.available = 1) AS actual_available
+        FROM titles t ORDER BY t.id
+        """, fetch=True)
+
+
+def test_copies_of_a_title_share_one_title_row(db_library):
+    db_library.add_book("Dune", "Frank Herbert", "Sci-Fi")
+    db_library.add_book("dune", "FRANK HERBERT", "Sci-Fi")
+
+    dune = [t for t in db_library.view_titles() if t["title"] == "Dune"]
+    assert [(t["total_copies"], t["available_copies"]) for t in dune] == [(2, 2)]
+
+
+def test_borrow_claims_any_free_copy(db_library):
+    db_library.add_book("Dune", "Frank Herbert", "Sci-Fi")
+    db_library.add_book("Dune", "Frank Herbert", "Sci-Fi")
+
+    assert "borrowed by" in db_library.borrow_book("Dune", "Arun")
+    assert "borrowed by" in db_library.borrow_book("Dune", "Priya")
+    assert "already borrowed" in db_library.borrow_book("Dune", "Arun")
+
+    assert "returned by" in db_library.return_book("Dune", "Priya")
+    holders = library_db.execute_query("SELECT borrower FROM books WHERE title='Dune' ORDER BY id", fetch=True)
+    assert [h["borrower"] for h in holders] == ["Arun", None]
+
+
+def test_copy_counts_stay_consistent(db_library):
+    db_library.add_book("Dune", "Frank Herbert", "Sci-Fi")
+    db_library.add_book("Dune", "Frank Herbert", "Sci-Fi")
+    db_library.borrow_book("Dune", "Arun")
+    db_library.borrow_book("The Alchemist", "Priya")
+    db_library.return_book("The Alchemist", "Priya")
+    db_library.delete_book(4)  # the borrowed copy of Dune
+
+    for row in _copy_counts():
+        assert (row["total_copies"], row["available_copies"]) == (row["actual_total"], row["actual_available"])
+
+
+def test_deleting_last_copy_drops_the_title(db_library):
+    db_library.delete_book(2)
+
+    assert "Atomic Habits" not in [t["title"] for t in db_library.view_titles()]
+    assert "not found" in db_library.borrow_book("Atomic Habits", "Arun")
+    assert "not found" in db_library.borrow_many(["Atomic Habits"], "Arun")[0]["message"]
+    assert "not found" in db_library.return_many(["Atomic Habits"], "Arun")[0]["message"]
 
-    result = library.delete_book(100)
-    assert "not found" in result
\ No newline at end of file
+    db_library.add_book("Atomic Habits", "James Clear", "Self-help")
+    assert "borrowed by" in db_library.borrow_book("Atomic Habits", "Arun")
+
+
+def test_borrow_probes_free_copy_index(db_library):
+    plan = library_db.execute_query("EXPLAIN QUERY PLAN SELECT id FROM books WHERE title_id=? AND available=1 LIMIT 1",
+                                    (1,), fetch=True)
+    assert any("idx_books_free_copy" in row["detail"] for row in plan)
+
+
+def test_init_db_groups_existing_copies_into_titles(temp_db):
+    conn = sqlite3.connect(temp_db)
+    conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                 "author TEXT NOT NULL, genre TEXT, available INTEGER DEFAULT 1, borrower TEXT)")
+    conn.executemany("INSERT INTO books (title, author, genre, available) VALUES (?, ?, ?, ?)",
+                     [("Emma", "Jane Austen", "Classic", 1), ("EMMA", "jane austen", "Classic", 0),
+                      ("Dune", "Frank Herbert", "Sci-Fi", 1)])
+    conn.commit()
+    conn.close()
+
+    titles = Library().view_titles()
+    assert [(t["title"], t["total_copies"], t["available_copies"]) for t in titles] == [("Emma", 2, 1), ("Dune", 1, 1)]
+
+
+# ---------------------------
+# TEST: LOANS AND DUE DATES
+# ---------------------------
+def test_borrow_sets_due_date(db_library):
+    db_library.borrow_book("The Alchemist", "Arun")
+
+    [loan] = db_library.open_loans()
+    borrowed = datetime.strptime(loan["borrow_date"], library_db.DATE_FORMAT)
+    due = datetime.strptime(loan["due_date"], library_db.DATE_FORMAT)
+    assert due - borrowed == timedelta(days=library_db.LOAN_PERIOD_DAYS)
+    assert (loan["book_title"], loan["member_name"]) == ("The Alchemist", "Arun")
+
+
+def test_open_and_overdue_loans(db_library):
+    for title in ("The Alchemist", "Atomic Habits", "To Kill a Mockingbird"):
+        db_library.borrow_book(title, "Arun")
+    db_library.return_book("Atomic Habits", "Arun")
+    library_db.execute_query("UPDATE borrowed_books SET due_date='2024-01-01 00:00:00' WHERE id=1")
+
+    assert [l["id"] for l in db_library.open_loans()] == [1, 3]
+    assert [l["id"] for l in db_library.open_loans(after_id=1, limit=1)] == [3]
+    assert [l["id"] for l in db_library.overdue_loans()] == [1]
+    assert db_library.overdue_loans(as_of=datetime(2023, 12, 31)) == []
+
+
+@pytest.mark.parametrize("hours", [5, -5])
+def test_overdue_loans_convert_aware_as_of_to_local_time(db_library, hours):
+    db_library.borrow_book("The Alchemist", "Arun")
+    library_db.execute_query("UPDATE borrowed_books SET due_date='2030-01-01 12:00:00'")
+    due = datetime(2030, 1, 1, 12, 0).astimezone()  # the due date as an aware local time
+    zone = timezone(timedelta(hours=hours))
+
+    assert db_library.overdue_loans(as_of=(due - timedelta(seconds=30)).astimezone(zone)) == []
+    assert [l["id"] for l in db_library.overdue_loans(as_of=(due + timedelta(seconds=30)).astimezone(zone))] == [1]
+
+
+def test_open_loan_queries_use_partial_index(db_library):
+    plan = library_db.execute_query(
+        "EXPLAIN QUERY PLAN SELECT id FROM borrowed_books WHERE return_date IS NULL AND due_date < ? AND id > ?",
+        ("2024-01-01", 0), fetch=True)
+    assert any("idx_borrowed_books_open" in row["detail"] for row in plan)
+
+
+def test_init_db_adds_due_dates_to_existing_loans(temp_db):
+    conn = sqlite3.connect(temp_db)
+    conn.execute("CREATE TABLE borrowed_books (id INTEGER PRIMARY KEY AUTOINCREMENT, book_id INTEGER NOT NULL, "
+                 "member_id INTEGER NOT NULL, borrow_date TEXT, return_date TEXT)")
+    conn.execute("INSERT INTO borrowed_books (book_id, member_id, borrow_date) VALUES (1, 1, '2024-03-01 10:00:00')")
+    conn.commit()
+    conn.close()
+
+    Library()
+    [loan] = library_db.execute_query("SELECT due_date FROM borrowed_books", fetch=True)
+    assert loan["due_date"] == "2024-03-15 10:00:00"
+
+
+# ---------------------------
+# TEST: FULL-TEXT SEARCH
+# ---------------------------
+def test_search_books_prefix_matches_title_and_author(db_library):
+    assert [b["title"] for b in db_library.search_books("atom hab")] == ["Atomic Habits"]
+    assert [b["title"] for b in db_library.search_books("harper")] == ["To Kill a Mockingbird"]
+    assert db_library.search_books("   ") == []
+
+
+def test_search_books_ranks_title_matches_first(db_library):
+    db_library.add_book("Memoirs", "Alchemist Society", "History")
+
+    results = db_library.search_books("alchemist")
+    assert [b["title"] for b in results] == ["The Alchemist", "Memoirs"]
+
+
+def test_search_index_follows_inserts_and_deletes(db_library):
+    db_library.add_book("Dune", "Frank Herbert", "Sci-Fi")
+    [dune] = db_library.search_books("dune")
+    db_library.delete_book(dune["id"])
+    assert db_library.search_books("dune") == []
+
+
+def test_init_db_indexes_existing_books(temp_db):
+    conn = sqlite3.connect(temp_db)
+    conn.execute("CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, "
+                 "author TEXT NOT NULL, genre TEXT, available INTEGER DEFAULT 1, borrower TEXT)")
+    conn.execute("INSERT INTO books (title, author, genre) VALUES ('Emma', 'Jane Austen', 'Classic')")
+    conn.commit()
+    conn.close()
+
+    assert [b["title"] for b in Library().search_books("austen")] == ["Emma"]
+
+
+# ---------------------------
+# TEST: STREAMING EXPORTS
+# ---------------------------
+def test_iter_query_fetches_in_batches(db_library):
+    rows = library_db.iter_query("SELECT id FROM books ORDER BY id", batch_size=2)
+    assert [r["id"] for r in rows] == [1, 2, 3]
+
+
+def test_iter_query_releases_connection_when_closed(db_library):
+    pool = library_db.get_pool()
+    idle = pool._idle.qsize()
+    rows = library_db.iter_query("SELECT id FROM books")
+    next(rows)
+    assert getattr(library_db._local, "conn", None) is None  # never published as the thread's connection
+    rows.close()
+    assert pool._idle.qsize() == max(idle, 1)
+
+
+def test_export_consumed_across_threads_leaves_no_held_connection(db_library):
+    first, second = ThreadPoolExecutor(max_workers=1), ThreadPoolExecutor(max_workers=1)
+    try:
+        rows = db_library.export_books()
+        assert first.submit(next, rows).result()["id"] == 1
+        assert [r["id"] for r in second.submit(list, rows).result()] == [2, 3]
+        second.submit(rows.close).result()
+
+        held = lambda: getattr(library_db._local, "conn", None)
+        assert first.submit(held).result() is None
+        assert second.submit(held).result() is None
+
+        def conn_is_also_idle():
+            # A connection in use on this thread must not be available to other threads
+            with library_db.connection() as conn:
+                return conn in list(library_db.get_pool()._idle.queue)
+        assert first.submit(conn_is_also_idle).result() is False
+    finally:
+        first.shutdown()
+        second.shutdown()
+
+
+def test_export_loans_streams_history(db_library):
+    db_library.borrow_book("The Alchemist", "Arun")
+    db_library.return_book("The Alchemist", "Arun")
+
+    loans = list(db_library.export_loans())
+    assert len(loans) == 1
+    assert loans[0]["return_date"] is not None
+
+
+# ---------------------------
+# TEST: BULK IMPORT
+# ---------------------------
+def test_import_books_csv_reports_bad_rows(db_library):
+    data = io.StringIO("title,author,genre\nDune,Frank Herbert,Sci-Fi\n,Nobody,Mystery\nEmma,Jane Austen,\n")
+
+    report = db_library.import_books(data, "csv", batch_size=1)
+
+    assert report["inserted"] == 2
+    assert report["failed"] == 1
+    assert report["errors"] == [{"line": 3, "error": "'title' is required"}]
+    assert [b["title"] for b in db_library.view_books(after_id=3)] == ["Dune", "Emma"]
+
+
+def test_import_members_jsonl(db_library):
+    data = io.StringIO('{"name": "Meera", "age": 41}\nnot json\n{"name": "Ravi", "age": "old"}\n')
+
+    report = db_library.import_members(data, "jsonl")
+
+    assert report["inserted"] == 1
+    assert [e["line"] for e in report["errors"]] == [2, 3]
+    assert db_library.view_members(after_id=2)[0]["name"] == "Meera"
+
+
+def test_import_of_undecodable_file_names_the_line_and_imports_nothing(db_library):
+    rows = "".join(f"Book {i},Author {i}\n" for i in range(1000))  # past the wrapper's first decoded chunk
+    data = io.TextIOWrapper(io.BytesIO(f"title,author\n{rows}Café,Anon\n".encode("latin-1")),
+                            encoding="utf-8", newline="")
+    with pytest.raises(ValueError, match=r"not valid UTF-8 after line \d+"):
+        db_library.import_books(data)
+    assert len(db_library.view_books()) == 3
+
+
+def test_import_rolls_back_on_database_error(db_library):
+    data = io.StringIO("title,author\nDune,Frank Herbert\n")
+    with patch("library_core_oops._book_row", side_effect=sqlite3.OperationalError("disk I/O error")):
+        with pytest.raises(sqlite3.OperationalError):
+            db_library.import_books(data)
+    assert len(db_library.view_books()) == 3
+
+
+# ---------------------------
+# TEST: STORAGE CONFIGURATION
+# ---------------------------
+def test_default_profile_enables_wal(temp_db):
+    with library_db.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+
+def test_storage_settings_env_and_profile(monkeypatch):
+    monkeypatch.setattr(library_db, "_storage_profile", "legacy")
+    monkeypatch.setenv("LIBRARY_DB_SYNCHRONOUS", "off")
+    settings = library_db.storage_settings()
+    assert settings["journal_mode"] == "DELETE"
+    assert settings["synchronous"] == "OFF"
+
+
+def test_storage_settings_reject_unknown_values(monkeypatch):
+    monkeypatch.setenv("LIBRARY_DB_TEMP_STORE", "MEMORY; DROP TABLE books")
+    with pytest.raises(ValueError):
+        library_db.storage_settings()
+    with pytest.raises(ValueError):
+        library_db.configure(profile="fastest")
+
+
+def test_library_db_path_is_injectable(tmp_path):
+    db_path = str(tmp_path / "branch" / "north.db")
+    with patch("library_db.DB_NAME", library_db.DB_NAME):
+        Library(db_path=db_path).add_book("Dune", "Frank Herbert", "Sci-Fi")
+        assert library_db.DB_NAME == db_path
+        library_db.close_pool()
+    assert sqlite3.connect(db_path).execute("SELECT title FROM books").fetchall() == [("Dune",)]
+
+
+def test_library_db_path_refuses_to_move_open_libraries(tmp_path):
+    north, south = str(tmp_path / "north.db"), str(tmp_path / "south.db")
+    with patch("library_db.DB_NAME", library_db.DB_NAME):
+        first = Library(db_path=north)
+        assert Library(db_path=north)._db_path == north
+        with pytest.raises(ValueError, match="process-wide"):
+            Library(db_path=south)
+        assert library_db.DB_NAME == north
+
+        first.close()
+        Library(db_path=south)
+        assert library_db.DB_NAME == south
+        library_db.close_pool()
+
+
+# ---------------------------
+# TEST: CONNECTION POOL
+# ---------------------------
+def test_execute_query_reuses_pooled_connection(temp_db):
+    library_db.init_db()
+    with library_db.connection() as first:
+        pass
+    with library_db.connection() as second:
+        library_db.execute_query("INSERT INTO members (name, age, contact_info) VALUES (?, ?, ?)", ("Arun", 25, ""))
+    assert first is second
+    assert library_db.execute_query("SELECT name FROM members", fetch=True) == [{"name": "Arun"}]
+
+
+def test_nested_connection_shares_outer_connection(temp_db):
+    with library_db.connection() as outer:
+        with library_db.connection() as inner:
+            assert inner is outer
+
+
+def test_transaction_rolls_back_on_error(temp_db):
+    library_db.init_db()
+    with pytest.raises(RuntimeError):
+        with library_db.transaction():
+            library_db.execute_query("INSERT INTO members (name, age, contact_info) VALUES (?, ?, ?)", ("Arun", 25, ""))
+            raise RuntimeError("boom")
+    assert library_db.execute_query("SELECT * FROM members", fetch=True) == []
+
+
+def test_pool_acquire_times_out_when_exhausted(temp_db):
+    pool = library_db.ConnectionPool(temp_db, size=1)
+    conn = pool.acquire()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.acquire(timeout=0.01)
+    pool.release(conn)
+    assert pool.acquire(timeout=0.01) is conn
+
+
+# ---------------------------
+# TEST: SCHEMA MIGRATIONS
+# ---------------------------
+def _tables():
+    return {row["name"] for row in library_db.execute_query(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'index', 'trigger')", fetch=True)}
+
+
+def test_new_database_is_migrated_to_latest_version(temp_db):
+    library_db.init_db()
+    with library_db.connection() as conn:
+        assert library_db.schema_version(conn) == library_db.SCHEMA_VERSION == len(library_db.MIGRATIONS)
+    assert {"books", "members", "borrowed_books", "books_fts", "titles", "books_title_insert"} <= _tables()
+
+
+def test_init_db_on_current_database_only_reads_version(temp_db):
+    library_db.init_db()
+    statements = []
+    with patch.object(library_db, "_schema_ready", set()), library_db.connection() as conn:
+        conn.set_trace_callback(statements.append)
+        library_db.init_db()
+        conn.set_trace_callback(None)
+    assert statements == ["PRAGMA user_version"]
+
+
+def test_init_db_applies_only_pending_migrations(temp_db):
+    assert library_db.migrate(target=2) == 2
+    assert "books_fts" not in _tables()
+    library_db.execute_query("INSERT INTO books (title, author, genre, available) VALUES ('Dune', 'Frank Herbert', '', 1)")
+
+    with patch.object(library_db, "_schema_ready", set()):
+        library_db.init_db()
+    assert {"books_fts", "titles"} <= _tables()
+    assert [b["title"] for b in Library().search_books("dune")] == ["Dune"]
+    assert library_db.execute_query("SELECT title, total_copies FROM titles", fetch=True) == [
+        {"title": "Dune", "total_copies": 1}]
+
+
+def test_migration_removes_titles_left_without_copies(temp_db):
+    library_db.migrate(target=library_db.MIGRATIONS.index(library_db._drop_titles_without_copies))
+    library_db.execute_query("INSERT INTO books (title, author, genre) VALUES ('Dune', 'Frank Herbert', '')")
+    library_db.execute_query("DELETE FROM books")
+    assert library_db.execute_query("SELECT total_copies FROM titles", fetch=True) == [{"total_copies": 0}]
+
+    with patch.object(library_db, "_schema_ready", set()):
+        library_db.init_db()
+    assert library_db.execute_query("SELECT * FROM titles", fetch=True) == []
+
+
+def test_failing_migration_keeps_last_good_version(temp_db):
+    def broken(conn):
+        conn.execute("CREATE TABLE half_done (id INTEGER)")
+        raise sqlite3.OperationalError("boom")
+
+    library_db.init_db()
+    with patch.object(library_db, "MIGRATIONS", library_db.MIGRATIONS + [broken]):
+        with pytest.raises(sqlite3.OperationalError):
+            library_db.migrate(target=library_db.SCHEMA_VERSION + 1)
+    with library_db.connection() as conn:
+        assert library_db.schema_version(conn) == library_db.SCHEMA_VERSION
+    assert "half_done" not in _tables()
+
+
+# ---------------------------
+# TEST: QUERY INSTRUMENTATION
+# ---------------------------
+def test_statements_are_timed_and_counted(db_library):
+    label = library_db.statement_label("SELECT id FROM members WHERE LOWER(name)=LOWER(?)")
+    before = library_db.STATEMENT_SECONDS.count(statement=label)
+    db_library.borrow_book("The Alchemist", "Arun")
+
+    assert library_db.STATEMENT_SECONDS.count(statement=label) == before + 1
+    insert = library_db.statement_label(
+        "INSERT INTO borrowed_books (book_id, member_id, borrow_date, due_date) VALUES (?, ?, ?, ?)")
+    assert library_db.ROWS.value(statement=insert) >= 1
+
+
+def test_iterated_cursor_records_one_fetch_sample(db_library):
+    query = "SELECT id FROM books ORDER BY id"
+    fetches, rows = library_db.FETCH_SECONDS.count(statement=query), library_db.ROWS.value(statement=query)
+    with patch("library_db.ITER_BATCH_SIZE", 2), library_db.connection() as conn:
+        assert [row["id"] for row in conn.execute(query)] == [1, 2, 3]
+
+    assert library_db.FETCH_SECONDS.count(statement=query) == fetches + 1
+    assert library_db.ROWS.value(statement=query) == rows + 3
+
+
+def test_statement_label_collapses_parameter_lists():
+    assert library_db.statement_label("SELECT *\n  FROM books WHERE id IN (?, ?, ?)") == \
+        "SELECT * FROM books WHERE id IN (?)"
+    assert library_db.statement_label("VALUES (?, ?), (?, ?), (?, ?)") == "VALUES (?)"
+
+
+def test_slow_queries_are_logged_with_plan(db_library, caplog):
+    with patch("library_db.SLOW_QUERY_MS", 0), patch("library_db.EXPLAIN_SLOW_QUERIES", True):
+        db_library.view_books(limit=1)
+    slow = library_db.recent_slow_queries()[-1]
+    assert slow["statement"].startswith("SELECT id, title, author, genre, available, borrower FROM books")
+    assert any("books" in step for step in slow["plan"])
+    assert "slow query" in caplog.text
+
+
+# ---------------------------
+# TEST: WRITE-BEHIND QUEUE
+# ---------------------------
+def test_write_behind_borrows_claim_book_once(temp_db):
+    library = Library(write_behind=True)
+    library_db.seed_data()
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            results = list(pool.map(lambda name: library.borrow_book("The Alchemist", name), ["Arun", "Priya"] * 4))
+        assert sum("borrowed by" in r for r in results) == 1
+    finally:
+        library.close()
+    assert len(library_db.execute_query("SELECT * FROM borrowed_books", fetch=True)) == 1
+
+
+def test_write_behind_groups_operations_into_one_transaction(temp_db):
+    library_db.init_db()
+    writer = library_db.WriteBehindQueue(max_batch=8, max_delay=0.2)
+    insert = lambda conn, name: conn.execute(
+        "INSERT INTO members (name, age, contact_info) VALUES (?, 30, '')", (name,)).lastrowid
+    try:
+        with patch.object(writer, "_commit", wraps=writer._commit) as commit:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                ids = list(pool.map(lambda name: writer.submit(insert, name), ["A", "B", "C", "D"]))
+        assert sorted(ids) == [1, 2, 3, 4]
+        assert commit.call_count == 1
+    finally:
+        writer.close()
+
+
+def test_write_behind_isolates_failing_operation(temp_db):
+    library_db.init_db()
+    writer = library_db.WriteBehindQueue(max_delay=0.2)
+
+    def insert(conn, name):
+        conn.execute("INSERT INTO members (name, age, contact_info) VALUES (?, 30, '')", (name,))
+        if name == "bad":
+            raise ValueError(name)
+
+    try:
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(writer.submit, insert, name) for name in ["Arun", "bad", "Priya"]]
+        with pytest.raises(ValueError):
+            futures[1].result()
+        assert futures[0].result() is None and futures[2].result() is None
+    finally:
+        writer.close()
+    names = library_db.execute_query("SELECT name FROM members ORDER BY name", fetch=True)
+    assert names == [{"name": "Arun"}, {"name": "Priya"}]
+    with pytest.raises(RuntimeError):
+        writer.submit(insert, "late")
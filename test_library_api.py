@@ -0,0 +1,231 @@
+import io
+import json
+import pytest
+from unittest.mock import patch
+import library_db
+from library_core_oops import Library
+
+# ---------------------------
+# FIXTURES
+# ---------------------------
+@pytest.fixture
+def client(tmp_path):
+    """Flask test client backed by a seeded temp database."""
+    with patch("library_db.DB_NAME", str(tmp_path / "library.db")):
+        import library_api  # imported late so its module-level Library() uses the temp database
+        library = Library()
+        library_db.seed_data()
+        library_api.tracer.windows.clear()
+        with patch("library_api.library", library_api.TracedLibrary(library)):
+            yield library_api.app.test_client()
+        library_db.close_pool()
+
+# ---------------------------
+# TEST: PAGINATED LISTINGS
+# ---------------------------
+def test_get_books_pages_with_cursor(client):
+    first = client.get("/books?limit=2").get_json()
+    assert [b["id"] for b in first["books"]] == [1, 2]
+    assert first["next_cursor"] == 2
+
+    last = client.get(f"/books?limit=2&after_id={first['next_cursor']}").get_json()
+    assert [b["id"] for b in last["books"]] == [3]
+    assert last["next_cursor"] is None
+
+
+def test_get_titles_reports_copy_counts(client):
+    client.post("/book", data={"title": "The Alchemist", "author": "Paulo Coelho", "genre": "Fiction"})
+    client.post("/borrow", data={"title": "The Alchemist", "member": "Arun"})
+
+    first = client.get("/titles?limit=1").get_json()
+    assert first["titles"][0]["total_copies"] == 2
+    assert first["titles"][0]["available_copies"] == 1
+    assert first["next_cursor"] == 1
+
+
+def test_get_members_clamps_limit(client):
+    page = client.get("/members?limit=0").get_json()
+    assert len(page["members"]) == 1
+    assert page["next_cursor"] == 1
+
+
+# ---------------------------
+# TEST: SEARCH
+# ---------------------------
+def test_search_books_endpoint(client):
+    body = client.get("/books/search?q=mocking").get_json()
+    assert [b["title"] for b in body["books"]] == ["To Kill a Mockingbird"]
+
+
+# ---------------------------
+# TEST: REPORTS
+# ---------------------------
+def test_reports_endpoint(client):
+    basic = client.get("/reports").get_json()
+    assert basic["Total Books"] == 3
+    assert "By Genre" not in basic
+
+    extended = client.get("/reports?extended=true").get_json()
+    assert extended["By Genre"]["Fiction"] == 1
+
+
+# ---------------------------
+# TEST: LOANS
+# ---------------------------
+def test_open_and_overdue_loan_endpoints(client):
+    client.post("/borrow", data={"title": "The Alchemist", "member": "Arun"})
+
+    open_loans = client.get("/loans/open").get_json()
+    assert [l["book_title"] for l in open_loans["loans"]] == ["The Alchemist"]
+
+    assert client.get("/loans/overdue").get_json()["loans"] == []
+    overdue = client.get("/loans/overdue?as_of=2999-01-01").get_json()
+    assert [l["member_name"] for l in overdue["loans"]] == ["Arun"]
+    assert client.get("/loans/overdue?as_of=tomorrow").status_code == 400
+    assert client.get("/loans/overdue", query_string={"as_of": "2999-01-01T00:00:00+05:00"}).get_json()["loans"]
+
+
+# ---------------------------
+# TEST: NDJSON EXPORT
+# ---------------------------
+def test_export_books_streams_ndjson(client):
+    response = client.get("/export/books.ndjson")
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/x-ndjson"
+
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [r["title"] for r in rows] == ["The Alchemist", "Atomic Habits", "To Kill a Mockingbird"]
+    assert rows[0]["available"] is True
+
+
+def test_export_unknown_table_is_404(client):
+    assert client.get("/export/secrets.ndjson").status_code == 404
+
+
+# ---------------------------
+# TEST: BULK IMPORT
+# ---------------------------
+def test_bulk_import_books_from_upload(client):
+    upload = (io.BytesIO(b'{"title": "Dune", "author": "Frank Herbert"}\n{"title": "No author"}\n'), "books.jsonl")
+    response = client.post("/books/bulk", data={"file": upload}, content_type="multipart/form-data")
+
+    report = response.get_json()
+    assert report["inserted"] == 1
+    assert report["errors"] == [{"line": 2, "error": "'author' is required"}]
+
+
+def test_bulk_import_members_from_raw_csv_body(client):
+    response = client.post("/members/bulk", data="name,age,contact_info\nMeera,41,m@mail.com\n", content_type="text/csv")
+    assert response.get_json()["inserted"] == 1
+
+
+def test_bulk_import_rejects_unknown_format(client):
+    assert client.post("/books/bulk?format=xml", data="<books/>").status_code == 400
+
+
+def test_bulk_import_rejects_non_utf8_body(client):
+    body = "title,author\nDune,Frank Herbert\nCafé,Anon\n".encode("latin-1")
+    response = client.post("/books/bulk", data=body, content_type="text/csv")
+
+    assert response.status_code == 400
+    assert "not valid UTF-8" in response.get_json()["message"]
+    assert client.get("/books/search", query_string={"q": "dune"}).get_json()["books"] == []
+
+# ---------------------------
+# TEST: BATCH BORROW / RETURN
+# ---------------------------
+def test_borrow_and_return_batch(client):
+    titles = ["The Alchemist", "Atomic Habits", "Missing Book"]
+    borrowed = client.post("/borrow/batch", json={"member": "Arun", "titles": titles}).get_json()
+    assert [r["title"] for r in borrowed["results"]] == titles
+    assert ["borrowed by" in r["message"] for r in borrowed["results"]] == [True, True, False]
+
+    returned = client.post("/return/batch", json={"member": "Arun", "titles": titles[:2]}).get_json()
+    assert all("returned by" in r["message"] for r in returned["results"])
+
+
+def test_batch_rejects_malformed_body(client):
+    assert client.post("/borrow/batch", json=["The Alchemist"]).status_code == 400
+    assert client.post("/return/batch", json={"member": "Arun", "titles": "The Alchemist"}).status_code == 400
+
+
+@pytest.mark.parametrize("path, payload", [
+    ("/borrow/batch", {"member": "Arun", "titles": 5}),
+    ("/borrow/batch", {"member": "Arun", "titles": {"The Alchemist": 1}}),
+    ("/return/batch", {"member": "Arun", "titles": 5}),
+    ("/resolve", {"titles": 5}),
+    ("/resolve", {"titles": ["The Alchemist"], "members": {"Arun": 1}}),
+    ("/borrow/batch", {"member": "Arun", "titles": ""}),
+    ("/borrow/batch", {"member": "Arun", "titles": 0}),
+    ("/return/batch", {"member": "Arun", "titles": False}),
+    ("/return/batch", {"member": "Arun", "titles": {}}),
+    ("/borrow/batch", {"member": "Arun", "titles": None}),
+    ("/resolve", {"titles": "", "members": []}),
+    ("/resolve", {"members": {}}),
+])
+def test_batch_rejects_titles_that_are_not_a_list(client, path, payload):
+    response = client.post(path, json=payload)
+    assert response.status_code == 400
+    assert "must be a list" in response.get_json()["message"]
+
+
+def test_borrow_and_return_by_id_endpoints(client):
+    assert "borrowed by" in client.post("/books/1/borrow", data={"member_id": 1}).get_json()["message"]
+    assert "returned by" in client.post("/books/1/return", data={"member_id": 1}).get_json()["message"]
+    assert client.post("/books/1/borrow", data={"member_id": "Arun"}).status_code == 400
+
+
+def test_resolve_endpoint(client):
+    resolved = client.post("/resolve", json={"titles": ["Atomic Habits"], "members": ["priya"]}).get_json()
+    assert resolved == {"titles": {"Atomic Habits": [2]}, "members": {"priya": [2]}}
+
+
+# ---------------------------
+# TEST: METRICS
+# ---------------------------
+def test_metrics_endpoint_reports_statement_timings(client):
+    client.post("/borrow", data={"title": "The Alchemist", "member": "Arun"})
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    body = response.get_data(as_text=True)
+    assert "# TYPE library_db_statement_seconds histogram" in body
+    assert 'library_db_statement_seconds_count{statement="INSERT INTO borrowed_books' in body
+    assert "library_db_pool_acquire_seconds_count" in body
+
+
+# ---------------------------
+# TEST: REQUEST TRACING
+# ---------------------------
+def test_request_id_is_echoed_or_generated(client):
+    assert client.get("/books", headers={"X-Request-ID": "kiosk-7.42"}).headers["X-Request-ID"] == "kiosk-7.42"
+    generated = client.get("/books", headers={"X-Request-ID": "bad id <script>"}).headers["X-Request-ID"]
+    assert len(generated) == 32
+
+
+def test_server_timing_splits_request_time(client):
+    timing = client.post("/borrow", data={"title": "The Alchemist", "member": "Arun"}).headers["Server-Timing"]
+    phases = dict(part.strip().split(";dur=") for part in timing.split(","))
+    assert set(phases) == {"flask", "library", "sqlite", "total"}
+    assert float(phases["sqlite"]) > 0
+    assert float(phases["total"]) >= float(phases["sqlite"])
+
+
+def test_latency_stats_report_percentiles_per_route(client):
+    for _ in range(3):
+        client.get("/books/1/borrow")  # 405: still traced, under its route
+        client.get("/members")
+    stats = client.get("/stats/latency").get_json()["routes"]
+    assert stats["GET /members"]["count"] == 3
+    assert stats["GET /members"]["p50_ms"] <= stats["GET /members"]["p99_ms"]
+
+
+def test_profile_sampling_dumps_stats(client, tmp_path):
+    import library_api
+    with patch.object(library_api.tracer, "profile_every", 1), \
+         patch.object(library_api.tracer, "profile_dir", str(tmp_path / "profiles")):
+        client.get("/books")
+    dumps = list((tmp_path / "profiles").glob("*-GET-books-*.prof"))
+    assert len(dumps) == 1
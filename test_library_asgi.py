@@ -0,0 +1,136 @@
+import asyncio
+import json
+import threading
+import pytest
+from unittest.mock import patch
+import library_db
+from library_core_oops import Library
+from library_asgi import LibraryASGI
+
+# ---------------------------
+# FIXTURES
+# ---------------------------
+@pytest.fixture
+def asgi_app(tmp_path):
+    """ASGI app over library_api, backed by a seeded temp database."""
+    with patch("library_db.DB_NAME", str(tmp_path / "library.db")):
+        import library_api  # imported late so its module-level Library() uses the temp database
+        library = Library()
+        library_db.seed_data()
+        with patch("library_api.library", library):
+            app = LibraryASGI(library_api.app, max_workers=2)
+            yield app
+            app.close()
+        library_db.close_pool()
+
+
+async def call(app, method, path, query=b"", body=b"", content_type=None):
+    """Send one HTTP request through the ASGI app; return (status, headers, body)."""
+    headers = [(b"content-type", content_type.encode())] if content_type else []
+    scope = {"type": "http", "method": method, "path": path, "query_string": query, "headers": headers}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app(scope, receive, send)
+    start = sent[0]
+    return start["status"], dict(start["headers"]), b"".join(m.get("body", b"") for m in sent[1:])
+
+
+def slow_wsgi_app(release):
+    def app(environ, start_response):
+        release.wait(5)
+        start_response("200 OK", [("Content-Type", "text/plain")])
+        return [b"done"]
+    return app
+
+# ---------------------------
+# TEST: ROUTES
+# ---------------------------
+def test_asgi_serves_flask_routes(asgi_app):
+    status, headers, body = asyncio.run(call(asgi_app, "GET", "/books", b"limit=2"))
+    assert status == 200
+    assert headers[b"content-type"] == b"application/json"
+    assert [b["id"] for b in json.loads(body)["books"]] == [1, 2]
+
+
+def test_asgi_borrow_with_form_body(asgi_app):
+    status, _, body = asyncio.run(call(asgi_app, "POST", "/borrow", body=b"title=The+Alchemist&member=Arun",
+                                       content_type="application/x-www-form-urlencoded"))
+    assert status == 200
+    assert "borrowed by" in json.loads(body)["message"]
+
+
+def test_asgi_streams_ndjson_export(asgi_app):
+    status, _, body = asyncio.run(call(asgi_app, "GET", "/export/books.ndjson"))
+    assert status == 200
+    assert [json.loads(line)["id"] for line in body.splitlines()] == [1, 2, 3]
+
+# ---------------------------
+# TEST: BACK-PRESSURE AND TIMEOUTS
+# ---------------------------
+def test_asgi_slow_export_keeps_its_slot_and_leaves_room_for_other_requests(asgi_app):
+    async def scenario():
+        resume = asyncio.Event()
+        chunks = []
+
+        async def slow_client(message):
+            chunks.append(message)
+            if message["type"] == "http.response.body" and message.get("more_body"):
+                await resume.wait()
+
+        scope = {"type": "http", "method": "GET", "path": "/export/books.ndjson", "query_string": b"",
+                 "headers": []}
+        messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+        async def receive():
+            return messages.pop(0)
+
+        export = asyncio.create_task(asgi_app(scope, receive, slow_client))
+        while len(chunks) < 2:
+            await asyncio.sleep(0.01)
+        pending = asgi_app.pending
+        second_export = await call(asgi_app, "GET", "/export/books.ndjson")
+        books = await asyncio.wait_for(call(asgi_app, "GET", "/books"), 5)
+        resume.set()
+        await export
+        return pending, second_export, books, asgi_app.pending
+
+    pending, (export_status, headers, _), (books_status, _, _), after = asyncio.run(scenario())
+    assert pending == 1  # the export still counts until its stream is closed
+    assert export_status == 503 and headers[b"retry-after"] == b"1"
+    assert books_status == 200
+    assert after == 0
+
+
+def test_asgi_rejects_requests_over_max_pending():
+    release = threading.Event()
+    app = LibraryASGI(slow_wsgi_app(release), max_workers=1, max_pending=1)
+
+    async def scenario():
+        first = asyncio.create_task(call(app, "GET", "/slow"))
+        await asyncio.sleep(0.05)
+        rejected = await call(app, "GET", "/slow")
+        release.set()
+        return await first, rejected
+
+    (first_status, _, first_body), (status, headers, _) = asyncio.run(scenario())
+    app.close()
+    assert (first_status, first_body) == (200, b"done")
+    assert status == 503
+    assert headers[b"retry-after"] == b"1"
+
+
+def test_asgi_times_out_slow_requests():
+    release = threading.Event()
+    app = LibraryASGI(slow_wsgi_app(release), max_workers=1, timeout=0.05)
+    status, _, body = asyncio.run(call(app, "GET", "/slow"))
+    release.set()
+    app.close()
+    assert status == 504
+    assert "timed out" in json.loads(body)["message"]
@@ -0,0 +1,117 @@
+import pytest
+from collections import Counter
+import library_core
+from library_core import LibraryStore
+
+# ---------------------------
+# FIXTURES
+# ---------------------------
+@pytest.fixture
+def store():
+    store = LibraryStore(self_check=True)
+    store.add_book("The Alchemist", "Paulo Coelho", "Fiction")
+    store.add_book("Atomic Habits", "James Clear", "Self-Help")
+    store.register_member("Arun", 25, "12345")
+    store.register_member("Priya", 30, "67890")
+    return store
+
+# ---------------------------
+# TEST: INDEXED LOOKUPS
+# ---------------------------
+def test_lookups_are_case_insensitive(store):
+    assert [b["id"] for b in store.find_books("the ALCHEMIST")] == [1]
+    assert store.find_members("ARUN")[0]["name"] == "Arun"
+    assert store.books_by_id[2]["title"] == "Atomic Habits"
+
+
+def test_borrow_and_return_track_member_titles(store):
+    assert "borrowed by" in store.borrow_book("the alchemist", "arun")
+    assert store.find_members("Arun")[0]["borrowed_books"] == Counter({"The Alchemist": 1})
+    assert store.books_by_id[1]["available"] is False
+
+    assert "returned by" in store.return_book("The Alchemist", "arun")
+    assert store.find_members("Arun")[0]["borrowed_books"] == Counter()
+    assert store.books_by_id[1]["available"] is True
+
+
+def test_borrow_uses_any_free_copy(store):
+    store.add_book("The Alchemist", "Paulo Coelho", "Fiction")
+
+    store.borrow_book("The Alchemist", "Arun")
+    assert "borrowed by" in store.borrow_book("The Alchemist", "Priya")
+    assert "already borrowed" in store.borrow_book("The Alchemist", "Arun")
+
+
+def test_return_releases_the_members_copy(store):
+    store.add_book("The Alchemist", "Paulo Coelho", "Fiction")
+    store.borrow_book("The Alchemist", "Arun")
+    store.borrow_book("The Alchemist", "Priya")
+
+    store.return_book("The Alchemist", "Priya")
+    assert store.books_by_id[1]["borrower"] == "Arun"
+    assert store.books_by_id[3]["available"] is True
+
+
+def test_member_holding_two_copies_keeps_one_after_a_return(store):
+    store.add_book("The Alchemist", "Paulo Coelho", "Fiction")
+    store.borrow_book("The Alchemist", "Arun")
+    store.borrow_book("The Alchemist", "Arun")
+    assert store.find_members("Arun")[0]["borrowed_books"] == Counter({"The Alchemist": 2})
+
+    store.return_book("The Alchemist", "Arun")
+    assert store.find_members("Arun")[0]["borrowed_books"] == Counter({"The Alchemist": 1})
+    assert store.view_reports()["borrowed"] == 1
+
+
+def test_unknown_book(store):
+    assert store.borrow_book("Missing", "Arun") == "Book not found."
+    assert store.return_book("Missing", "Arun") == "Book not found."
+
+
+def test_return_without_loan_does_not_fail(store):
+    assert "returned by" in store.return_book("Atomic Habits", "Priya")
+
+def test_records_are_compact_and_dict_like(store):
+    book = store.books_by_id[1]
+    assert not hasattr(book, "__dict__")
+    assert book == {"id": 1, "title": "The Alchemist", "author": "Paulo Coelho", "genre": "Fiction",
+                    "available": True, "borrower": ""}
+    assert store.members[0]["borrowed_books"] == Counter()
+    with pytest.raises(KeyError):
+        book["isbn"] = "123"
+
+# ---------------------------
+# TEST: REPORT COUNTERS
+# ---------------------------
+def test_report_counters_follow_borrow_and_return(store):
+    store.add_book("Dune", "Frank Herbert", "Fiction")
+    store.borrow_book("Dune", "Arun")
+    store.borrow_book("Dune", "Priya")  # no free copy, counters unchanged
+    store.return_book("Atomic Habits", "Priya")  # was not borrowed, counters unchanged
+
+    assert store.view_reports(extended=True) == {
+        "Total Books": 3, "borrowed": 1, "available": 2,
+        "by_genre": {"Fiction": 2, "Self-Help": 1},
+    }
+
+
+def test_self_check_detects_drift(store):
+    store.books[0]["available"] = False  # changed behind the store's back
+    with pytest.raises(AssertionError):
+        store.view_reports()
+
+# ---------------------------
+# TEST: MODULE API
+# ---------------------------
+def test_module_functions_share_one_store():
+    library_core.reset()
+    library_core.add_book("Dune", "Frank Herbert", "Sci-Fi")
+    library_core.register_member("Arun", 25, "12345")
+
+    library_core.borrow_book("dune", "Arun")
+    assert library_core.view_books()[0]["borrower"] == "Arun"
+    assert library_core.view_members()[0]["borrowed_books"] == Counter({"Dune": 1})
+    assert library_core.view_reports() == {"Total Books": 1, "borrowed": 1, "available": 0}
+    assert list(library_core.book_columns()["id"]) == [1]
+    library_core.reset()
+    assert library_core.view_books() == []
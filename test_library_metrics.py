@@ -0,0 +1,38 @@
+import pytest
+from library_metrics import Registry
+
+
+def test_counter_renders_labelled_values():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests served.", ["route"])
+    requests.inc(route="/books")
+    requests.inc(2, route='/say "hi"')
+
+    text = registry.render()
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{route="/books"} 1' in text
+    assert 'requests_total{route="/say \\"hi\\""} 2' in text
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = Registry()
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_sum 5.55" in lines
+    assert "latency_seconds_count 3" in lines
+
+
+def test_registry_rejects_mismatched_labels_and_types():
+    registry = Registry()
+    requests = registry.counter("requests_total", "Requests served.", ["route"])
+    assert registry.counter("requests_total", "Requests served.", ["route"]) is requests
+    with pytest.raises(ValueError):
+        requests.inc(method="GET")
+    with pytest.raises(ValueError):
+        registry.histogram("requests_total", "Clash.")
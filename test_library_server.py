@@ -0,0 +1,108 @@
+import json
+import multiprocessing
+import os
+import re
+import signal
+import subprocess
+import sys
+import urllib.request
+import pytest
+from unittest.mock import patch
+import library_db
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="prefork serving needs fork()")
+
+
+# ---------------------------
+# FIXTURES
+# ---------------------------
+@pytest.fixture
+def temp_db(tmp_path):
+    with patch("library_db.DB_NAME", str(tmp_path / "library.db")):
+        yield library_db.DB_NAME
+        library_db.close_pool()
+
+
+def _init_and_count_books(queue):
+    library_db.init_db()
+    queue.put(library_db.execute_query("SELECT COUNT(*) AS n FROM books", fetch=True)[0]["n"])
+
+
+def _add_book_and_count(queue):
+    from library_core_oops import Library
+    library = Library()
+    library.add_book("Dune", "Frank Herbert", "Sci-Fi")
+    queue.put(library.view_reports()["Total Books"])
+
+
+def _query_after_fork(queue):
+    queue.put((library_db._pool is None, library_db.execute_query("SELECT 1 AS one", fetch=True)))
+
+
+# ---------------------------
+# TEST: SCHEMA LOCK AND FORK SAFETY
+# ---------------------------
+def test_concurrent_processes_create_schema_once(temp_db):
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    workers = [ctx.Process(target=_init_and_count_books, args=(queue,)) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(10)
+    assert [worker.exitcode for worker in workers] == [0] * 4
+    assert sorted(queue.get(timeout=1) for _ in workers) == [0] * 4
+
+
+def test_forked_child_opens_its_own_connections(temp_db):
+    library_db.init_db()
+    with library_db.connection():
+        pass  # leave an idle pooled connection behind for the child to inherit
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    child = ctx.Process(target=_query_after_fork, args=(queue,))
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0
+    assert queue.get(timeout=1) == (True, [{"one": 1}])
+    assert library_db._pool is not None  # the parent's pool is untouched
+
+
+def test_write_in_another_process_invalidates_cached_reads(temp_db):
+    from library_core_oops import Library
+    library = Library()
+    assert library.view_reports()["Total Books"] == 0  # cached in this process
+
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    child = ctx.Process(target=_add_book_and_count, args=(queue,))
+    child.start()
+    child.join(10)
+    assert child.exitcode == 0
+    assert queue.get(timeout=1) == 1
+    assert library.view_reports()["Total Books"] == 1
+
+
+def test_init_db_runs_once_per_process(temp_db):
+    library_db.init_db()
+    with patch("library_db.transaction") as transaction:
+        library_db.init_db()
+    transaction.assert_not_called()
+
+
+# ---------------------------
+# TEST: PREFORK LAUNCHER
+# ---------------------------
+def test_server_runs_workers_and_stops_on_sigterm(tmp_path):
+    env = dict(os.environ, LIBRARY_DB_PATH=str(tmp_path / "library.db"))
+    server = subprocess.Popen([sys.executable, "library_server.py", "--port", "0", "--workers", "2"],
+                              cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        port = re.search(r":(\d+) with 2 worker", server.stdout.readline()).group(1)
+        for _ in range(4):
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/books", timeout=5) as response:
+                assert json.load(response)["books"] == []
+    finally:
+        server.send_signal(signal.SIGTERM)
+        assert server.wait(10) == 0